@@ -0,0 +1,61 @@
+"""
+Parse time and memory of the CSV artifacts against their Parquet copies.
+
+    python -m pipeline.artifacts
+    python -m benchmarks.bench_artifacts
+
+The CSV side is timed the way the pages used to read it (plain read_csv and
+then pd.to_datetime on month_year), the Parquet side is a plain read_parquet.
+"""
+import time
+
+import pandas as pd
+
+from data_service.registry import local_path, parquet_path
+from data_service.schemas import SCHEMAS
+
+
+def _best_of(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _read_csv_untyped(path):
+    df = pd.read_csv(path)
+    if 'month_year' in df.columns:
+        df['month_year'] = pd.to_datetime(df['month_year'])
+    return df
+
+
+def run(repeat=5):
+    rows = []
+    for name in SCHEMAS:
+        csv_path, pq_path = local_path(name), parquet_path(name)
+        if not csv_path.exists() or not pq_path.exists():
+            continue
+        csv_time, csv_df = _best_of(lambda: _read_csv_untyped(csv_path), repeat)
+        pq_time, pq_df = _best_of(lambda: pd.read_parquet(pq_path), repeat)
+        rows.append({
+            'dataset': name,
+            'rows': len(csv_df),
+            'csv_kb': csv_path.stat().st_size / 1024,
+            'parquet_kb': pq_path.stat().st_size / 1024,
+            'csv_ms': csv_time * 1000,
+            'parquet_ms': pq_time * 1000,
+            'csv_mem_kb': csv_df.memory_usage(deep=True).sum() / 1024,
+            'parquet_mem_kb': pq_df.memory_usage(deep=True).sum() / 1024,
+        })
+    report = pd.DataFrame(rows).set_index('dataset')
+    report['speedup'] = report['csv_ms'] / report['parquet_ms']
+    report['mem_ratio'] = report['parquet_mem_kb'] / report['csv_mem_kb']
+    return report
+
+
+if __name__ == '__main__':
+    pd.set_option('display.width', 200)
+    pd.set_option('display.max_columns', None)
+    print(run().round(2))
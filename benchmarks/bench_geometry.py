@@ -0,0 +1,46 @@
+"""
+Row-wise apply WKT (as in PythonCapstone.ipynb) against the vectorized geometry builders.
+
+    python -m benchmarks.bench_geometry [rows]
+
+Uses random coordinates inside the Montgomery County bounding box.
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from pipeline.geometry import points_from_coordinates, to_wkb, wkt_strings
+
+
+def _time(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def run(rows=1_000_000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Longitude': rng.uniform(-77.53, -76.88, rows).round(5),
+        'Latitude': rng.uniform(38.93, 39.35, rows).round(5),
+    })
+    timings = {}
+    timings['apply_wkt'], apply_wkt = _time(
+        lambda: df.apply(lambda row: f"POINT ({row['Longitude']} {row['Latitude']})", axis=1)
+    )
+    timings['vectorized_wkt'], vector_wkt = _time(lambda: wkt_strings(df))
+    timings['points_from_xy'], points = _time(lambda: points_from_coordinates(df))
+    timings['points_to_wkb'], _ = _time(lambda: to_wkb(points))
+
+    assert (apply_wkt == vector_wkt).all(), 'vectorized WKT differs from the notebook format'
+    report = pd.Series(timings, name='seconds').to_frame()
+    report['speedup_vs_apply'] = timings['apply_wkt'] / report['seconds']
+    return report
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f'{rows} rows')
+    print(run(rows).round(3))
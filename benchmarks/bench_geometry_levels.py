@@ -0,0 +1,77 @@
+"""
+Payload and render cost of each tract geometry level.
+
+    python -m pipeline.simplify
+    python -m benchmarks.bench_geometry_levels
+
+kb / gzip_kb are what the browser downloads (streamlit serves static/ gzipped). Render
+time is measured by drawing the decoded polygons into a 400x400 Agg canvas,
+a stand-in for the browser's geoshape rendering that scales the same way with
+vertex count. area_err is the relative area difference to the full geometry.
+"""
+import gzip
+import json
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import pandas as pd
+import shapely
+
+from data_service.geo_cache import FULL_LEVEL, GEOMETRY_LEVELS, level_dataset
+from data_service.registry import local_path
+from pipeline.simplify import decode_arcs, geometry_shapes
+
+
+def _shapes(path):
+    with open(path, encoding='utf-8') as f:
+        topology = json.load(f)
+    geometries = topology['objects']['data']['geometries']
+    return topology, geometry_shapes(geometries, decode_arcs(topology))
+
+
+def _render_ms(shapes, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fig, ax = plt.subplots(figsize=(4, 4), dpi=100)
+        for shape in shapes:
+            for polygon in shape.geoms:
+                x, y = polygon.exterior.xy
+                ax.fill(x, y, edgecolor='white', linewidth=1)
+        ax.set_axis_off()
+        fig.canvas.draw()
+        plt.close(fig)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run(name='scattermap_topo', repeat=3):
+    _, full_shapes = _shapes(local_path(name))
+    full_area = shapely.area(full_shapes)
+    rows = []
+    for level in [*GEOMETRY_LEVELS, FULL_LEVEL]:
+        path = local_path(level_dataset(name, level))
+        if not path.exists():
+            continue
+        raw = path.read_bytes()
+        topology, shapes = _shapes(path)
+        area_err = abs(shapely.area(shapes) / full_area - 1)
+        rows.append({
+            'level': level,
+            'kb': len(raw) / 1024,
+            'gzip_kb': len(gzip.compress(raw)) / 1024,
+            'arc_points': sum(len(arc) for arc in topology['arcs']),
+            'invalid': int((~shapely.is_valid(shapes)).sum()),
+            'area_err_mean': area_err.mean(),
+            'area_err_max': area_err.max(),
+            'render_ms': _render_ms(shapes, repeat),
+        })
+    return pd.DataFrame(rows).set_index('level')
+
+
+if __name__ == '__main__':
+    pd.set_option('display.width', 200)
+    pd.set_option('display.max_columns', None)
+    print(run().round(4))
@@ -0,0 +1,49 @@
+"""
+Cold start cost of each page.
+
+    python -m benchmarks.bench_page_imports
+
+startup_s runs the page file in a fresh interpreter without calling main()
+(capstone.py has no main and runs whole, in bare mode), which is what the
+first session pays before the page draws anything. import_ms is the -X
+importtime total of the page's module-level imports (data_service/import_profile.py).
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+import pandas as pd
+
+from data_service.import_profile import PAGES, import_report
+from data_service.registry import REPO_ROOT
+
+SCRIPT = "import runpy, time; start = time.perf_counter(); runpy.run_path({page!r}, run_name='bench'); print(time.perf_counter() - start)"
+
+
+def _startup_s(page, repeat):
+    env = {**os.environ, 'PYTHONPATH': str(REPO_ROOT)}
+    times = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-c', SCRIPT.format(page=page)], cwd=REPO_ROOT, env=env,
+                                capture_output=True, text=True, check=True)
+        times.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(times)
+
+
+def run(pages=PAGES, repeat=5):
+    rows = []
+    for page in pages:
+        report = import_report(page)
+        rows.append({
+            'page': page,
+            'startup_s': _startup_s(page, repeat),
+            'import_ms': report.attrs['total_ms'],
+            'heaviest': report['module'].iloc[0] if len(report) else '',
+        })
+    return pd.DataFrame(rows).set_index('page')
+
+
+if __name__ == '__main__':
+    pd.set_option('display.width', 200)
+    print(run().round(3))
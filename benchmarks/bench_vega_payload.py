@@ -0,0 +1,50 @@
+"""
+Spec payload size of the timeseries chart, browser transforms against server transforms.
+
+    python -m benchmarks.bench_vega_payload
+
+For every LINEGRAPH option (all values selected, default series cap) the spec
+is built the way pages/timeseries.py builds it. 'browser' is the single vconcat
+chart with the brush filter evaluated client side; 'server' is the overview alone,
+as sent with nothing brushed, and 'server_12m' the overview + detail pair with a
+12 month brush.
+"""
+import pandas as pd
+
+from data_service.downsampling import reduce_for_rendering
+from data_service.vega_transforms import spec_payload_bytes
+from pages import timeseries
+
+# LINEGRAPH option -> column it groups by
+OPTIONS = {key: labels[0] for key, labels in timeseries.LINEGRAPH_LABELS.items()}
+
+
+def run():
+    rows = []
+    for key, frame in zip(OPTIONS, timeseries.data_loader()):
+        dim = OPTIONS[key]
+        data = timeseries.aggregate_linegraph(key, frame, dim, [])
+        data = reduce_for_rendering(data, dim, max_series=timeseries.SERIES_CAP,
+                                    max_points=timeseries.MAX_POINTS_PER_SERIES)
+        last = data['month_year'].max()
+        brush = (last - pd.DateOffset(months=11), last)
+
+        browser = timeseries.linemap_function(data, dim, key, key)
+        overview = timeseries.linemap_overview(data, dim, key, key)
+        rows.append({
+            'option': key,
+            'rows': len(data),
+            'browser_kb': spec_payload_bytes(browser) / 1024,
+            'server_kb': spec_payload_bytes(overview) / 1024,
+            'server_12m_kb': spec_payload_bytes(overview, timeseries.linemap_detail(data, brush, dim, key)) / 1024,
+        })
+    report = pd.DataFrame(rows).set_index('option')
+    report['server_ratio'] = report['server_kb'] / report['browser_kb']
+    report['server_12m_ratio'] = report['server_12m_kb'] / report['browser_kb']
+    return report
+
+
+if __name__ == '__main__':
+    pd.set_option('display.width', 200)
+    pd.set_option('display.max_columns', None)
+    print(run().round(2))
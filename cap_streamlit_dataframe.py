@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+from data_service import load_bundle
 #Page 2: Streamlit DataFrame with Colored Column Names 
 
 transformed_list= [ 
@@ -53,16 +54,8 @@ datasets_list = ['dispatch', 'crime', 'joined', 'treemap', 'choropleth1','chorop
 
 
 def data_loader():
-    # Load the data
-    dispatch = pd.read_csv("https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/capstone_streamlit_dispatch_short.csv")
-    crime = pd.read_csv("https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/capstone_streamlit_crime_short.csv")
-    census = pd.read_csv("https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/capstone_streamlit_census_short.csv")
-    joined = pd.read_csv("https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/capstone_streamlit_joined_short.csv")
-    treemap = pd.read_csv("https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/capstone_streamlit_treemap_short.csv")
-    choropleth1 = pd.read_csv("https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/capstone_streamlit_choropleth1_short.csv")
-    choropleth2 = pd.read_csv("https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/capstone_streamlit_choropleth2_short.csv")
-    line = pd.read_csv("https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/capstone_streamlit_line_short.csv")
-    return dispatch, crime, census, joined, treemap, choropleth1, choropleth2, line 
+    # Load the data, shared with every other page and session (see data_service/bundles.py)
+    return load_bundle('breakdown')
     
 
 def color_columns(selected_dataset, transformed_list, merged_list, join_list, census_list, dispatch_list, crime_list):
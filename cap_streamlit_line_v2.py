@@ -4,6 +4,7 @@ import pandas as pd
 import numpy as np
 import logging
 import altair as alt
+from data_service import load_bundle
 
 
 logger = logging.getLogger(__name__)
@@ -11,14 +12,10 @@ logging.basicConfig(level=logging.DEBUG)
 
 def data_loader():
     try:
-#'https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/capstone_streamlit_scattermap_topo.json'
+        # Same frames as pages/timeseries.py, see data_service/bundles.py
+        frames = load_bundle('linemap')
 
-        df_age_cn1 = pd.read_csv('https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/capstone_streamlit_linemap_agecn1.csv')
-        df_cn1_cn2 = pd.read_csv('https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/capstone_streamlit_linemap_cn1cn2.csv')
-        df_match_cat = pd.read_csv('https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/capstone_streamlit_linemap_catsum.csv')
-     
-
-        return df_age_cn1,df_cn1_cn2,df_match_cat, # df_match_victims,df_match_age,
+        return frames.df_age_cn1, frames.df_cn1_cn2, frames.df_match_cat
     except Exception as e:
         logger.error(f'error in loading: {str(e)}')
         raise e
@@ -31,8 +28,8 @@ def linemap_function(filtered_linegraph_dataset, selected_linegraph_first_value,
     '''
     try:
         linegraph_x_values = 'Year and Month'
-        linegraph_dataset = filtered_linegraph_dataset.groupby(['month_year', selected_linegraph_first_value])['count'].sum().reset_index()
-        if pd.api.types.is_period_dtype(linegraph_dataset['month_year']):
+        linegraph_dataset = filtered_linegraph_dataset.groupby(['month_year', selected_linegraph_first_value], observed=True)['count'].sum().reset_index()
+        if isinstance(linegraph_dataset['month_year'].dtype, pd.PeriodDtype):
             linegraph_dataset['month_year'] = linegraph_dataset['month_year'].dt.to_timestamp()
 
         # Create a selection that chooses the nearest point & selects based on x-value
@@ -5,6 +5,7 @@ import geopandas as gpd
 import altair as alt
 import numpy as np
 import logging
+from data_service import load_bundle, remote_url
 from sklearn.metrics import r2_score
 from sklearn.linear_model import LinearRegression
 
@@ -13,10 +14,9 @@ logging.basicConfig(level=logging.DEBUG)
 
 def load_and_prepare_data(selected_crime):
     try:
-        file_path = 'https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/capstone_streamlit_scattermap_topo.json'
-        
-        gdf = gpd.read_file(file_path, driver='TopoJSON')
-        geo = alt.topo_feature(file_path, feature='data')
+        # Parsed once and shared, the browser still fetches the TopoJSON itself
+        gdf = load_bundle('scattermap').gdf
+        geo = alt.topo_feature(remote_url('scattermap_topo'), feature='data')
         
         if selected_crime not in gdf.columns:
             logger.error(f"Column '{selected_crime}' not found in data")
@@ -4,16 +4,17 @@ import pandas as pd
 import numpy as np
 import logging
 import plotly.graph_objects as go
+from data_service import load_bundle
+from data_service.hierarchy import build_hierarchy
+from data_service.treemap_cache import prepare
 
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG)
 def data_loader():
     try:
-        file_path = "https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/capstone_streamlit_treemap.csv"
-        df_treemap = pd.read_csv(file_path)
-        reverse_match_dict = {1 :'Dispatch', 2: 'Crime', 3:'Match'}
-        df_treemap['match_status'] = df_treemap['match_status'].map(reverse_match_dict)
+        # The shared frame is read-only, prepare maps match_status on a new one
+        df_treemap = prepare(load_bundle('treemap').df_treemap)
     
         return df_treemap
     except Exception as e:
@@ -23,29 +24,14 @@ def data_loader():
 def treemap(df_treemap, selection):
     try:
 # I need df_treemap, selection
-# Group data by match_status and my selection
-        grouped_data = df_treemap.groupby(['match_status', selection ]).size().reset_index(name='count')
-
-        labels = []
-        parents = []
-        values = []
-
-        for parent in grouped_data['match_status'].unique():
-            labels.append(parent)
-            parents.append('Montgomery County')
-            values.append(grouped_data[grouped_data['match_status'] == parent]['count'].sum())
-    
-            children = grouped_data[grouped_data['match_status'] == parent]
-            for _, row in children.iterrows():
-                labels.append(f"{row[selection]}")
-                parents.append(parent)
-                values.append(row['count'])
-
+# One node per match_status and per match_status / selection pair, see data_service/hierarchy.py
+        nodes = build_hierarchy(df_treemap, ['match_status', selection], root='Montgomery County')
 
         treemap = go.Figure(go.Treemap(
-            labels=labels,
-            parents=parents,
-            values=values,
+            ids=nodes['ids'],
+            labels=nodes['labels'],
+            parents=nodes['parents'],
+            values=nodes['values'],
             textinfo="label+value",
             branchvalues="total"
         ))
@@ -1,4 +1,5 @@
 import streamlit as st
+from data_service.warmup import start_warmup
 
 
 # Set page configuration
@@ -8,6 +9,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Precompute every page's options in the background while the landing page is read (once per process).
+# data_service.warmup only imports the standard library, pandas and the data load on the warm-up thread.
+warmup = start_warmup()
+
 # Custom CSS to style the app
 def local_css():
     st.markdown("""
@@ -101,6 +106,31 @@ The data spans from November 2018 to November 2024, covering a wide range of inc
 
 """)
 
+# Readiness of the background warm-up. The progress fragment polls while it runs and
+# reruns the page once it is done, which then draws the static caption instead
+@st.fragment(run_every=2)
+def warmup_progress():
+    if warmup.ready:
+        st.rerun()
+    elif warmup.total:
+        st.progress(warmup.done / warmup.total, text=f"Precomputing views in the background: {warmup.done} of {warmup.total} ready")
+    else:
+        st.progress(0, text="Precomputing views in the background...")
+
+def warmup_caption():
+    if warmup.error:
+        st.caption(f"Views could not be precomputed, they load when opened ({warmup.error})")
+    elif warmup.failed:
+        st.caption(f"{warmup.total - len(warmup.failed)} of {warmup.total} views precomputed, "
+                   f"the others load when opened: {', '.join(warmup.failed)}")
+    else:
+        st.caption(f"All {warmup.total} views are precomputed ({warmup.seconds():.0f}s)")
+
+if warmup.ready:
+    warmup_caption()
+else:
+    warmup_progress()
+
 # Navigation Section
 st.markdown('<div class="sub-header">Navigation</div>', unsafe_allow_html=True)
 
@@ -143,5 +173,16 @@ I would very much like to give my deepest thanks to Professor Jane Valentine, an
 It was a real pleasure to get to work with dataMontgomery. 
 """)
 
+# Import-time report of every page, only shown when opened with ?profile=imports
+if st.query_params.get('profile') == 'imports':
+    from data_service.import_profile import page_reports
+
+    st.markdown('<div class="sub-header">Import profile</div>', unsafe_allow_html=True)
+    with st.spinner('Profiling the imports of every page in a fresh interpreter...'):
+        reports = page_reports()
+    for page, report in reports.items():
+        st.markdown(f"**{page}**: {report.attrs['total_ms']:.0f} ms")
+        st.dataframe(report[['module', 'self_ms', 'cumulative_ms']], hide_index=True)
+
 # Footer
 st.markdown('<div class="footer">steal away</div>', unsafe_allow_html=True)
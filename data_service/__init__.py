@@ -0,0 +1,29 @@
+"""
+Loading, caching and typed access for the dashboard datasets.
+
+The names below are imported from their submodule on first use, so importing
+a light submodule (data_service.warmup, say) does not pull in pandas and
+streamlit before the landing page has drawn.
+"""
+import importlib
+
+_EXPORTS = {
+    'data_service.registry': [
+        'DATASETS', 'browser_url', 'clear_cache', 'dataset_version', 'load_config', 'load_dataset', 'local_path',
+        'parquet_path', 'read_dataset', 'remote_url', 'resolve',
+    ],
+    'data_service.schemas': ['SCHEMAS', 'apply_schema', 'read_typed_csv'],
+    'data_service.cube': ['IncidentCube', 'load_cube'],
+    'data_service.bundles': ['BUNDLES', 'LOAD_WORKERS', 'bundle_datasets', 'load_bundle', 'load_member'],
+}
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = list(_MODULES)
+
+
+def __getattr__(name):
+    if name not in _MODULES:
+        raise AttributeError(f"module 'data_service' has no attribute '{name}'")
+    value = getattr(importlib.import_module(_MODULES[name]), name)
+    globals()[name] = value
+    return value
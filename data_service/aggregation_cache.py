@@ -0,0 +1,78 @@
+"""
+Bounded LRU memo for aggregated chart data.
+
+Checkbox toggles on the timeseries page rerun the same filter + rollup over and
+over. Results are keyed on (dataset, dimension, frozenset of selected values),
+so toggling a value off and back on returns the frame computed the first time.
+The cache is process-wide and shared between sessions; the returned frames
+must not be modified. hits / misses are kept for monitoring.
+"""
+from collections import OrderedDict
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class AggregationCache:
+    """
+    Thread-safe LRU cache with hit and miss counters
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(dataset, dimension, selected, version=None):
+        return (dataset, version, dimension, frozenset(selected))
+
+    def __contains__(self, key):
+        # Does not count as a hit or a miss, for callers deciding whether to compute ahead
+        with self._lock:
+            return key in self._entries
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value for key, calling compute() on a miss
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        # Computed outside the lock so one slow aggregation does not block other sessions
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+linemap_cache = AggregationCache(maxsize=64)
+# Altair chart objects of the pages, keyed on the page, option and widget values (see data_service/prefetch.py)
+chart_cache = AggregationCache(maxsize=64)
@@ -0,0 +1,89 @@
+"""
+The datasets each page reads, kept in one place.
+
+Pages (and the legacy cap_streamlit_* scripts) used to carry their own list of
+files and unpack them from a tuple by position. A bundle names every frame a
+page needs; load_bundle returns them as a named tuple, so page code reads
+frames.dispatch while old code can still unpack it in order. The frames come
+from load_dataset, so moving between pages reuses what is already loaded.
+
+A page that shows one frame at a time reads just that one with load_member.
+load_bundle(bundle, workers=n) reads the files on a thread pool. File and
+network reads and the C parsers release the GIL, and the registry cache locks
+per dataset, so the files are read side by side.
+"""
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+from data_service.registry import load_dataset
+
+logger = logging.getLogger(__name__)
+
+# bundle -> {field: dataset}, fields in the order the pages unpack them
+BUNDLES = {
+    # pages/data_breakdown.py, cap_streamlit_dataframe.py
+    'breakdown': {
+        'dispatch': 'dispatch_short',
+        'crime': 'crime_short',
+        'census': 'census_short',
+        'joined': 'joined_short',
+        'treemap': 'treemap_short',
+        'choropleth1': 'choropleth1_short',
+        'choropleth2': 'choropleth2_short',
+        'line': 'linemap_short',
+    },
+    # pages/timeseries.py when the incident cube is not built, cap_streamlit_line_v*.py
+    'linemap': {
+        'df_age_cn1': 'linemap_agecn1',
+        'df_cn1_cn2': 'linemap_cn1cn2',
+        'df_match_cat': 'linemap_catsum',
+        'df_cn2': 'linemap_cn2',
+    },
+    # pages/treemap.py, cap_streamlit_treemap_v1.py
+    'treemap': {
+        'df_treemap': 'treemap',
+    },
+    # cap_streamlit_scatter_v8.py, cap_streamlit_scattermap_v11.py (the page goes through geo_cache)
+    'scattermap': {
+        'gdf': 'scattermap_topo',
+    },
+}
+
+LOAD_WORKERS = 4
+
+_tuples = {bundle: namedtuple(f'{bundle.title()}Frames', fields) for bundle, fields in BUNDLES.items()}
+
+
+def bundle_datasets(bundle):
+    """
+    Dataset names of a bundle, in field order
+    """
+    if bundle not in BUNDLES:
+        raise KeyError(f"Unknown bundle '{bundle}'")
+    return list(BUNDLES[bundle].values())
+
+
+def load_member(bundle, field):
+    """
+    One frame of a bundle, without loading the others
+    """
+    datasets = BUNDLES.get(bundle, {})
+    if field not in datasets:
+        raise KeyError(f"'{field}' is not in bundle '{bundle}'")
+    return load_dataset(datasets[field])
+
+
+def load_bundle(bundle, workers=1):
+    """
+    The frames of a bundle as a named tuple, read on a thread pool when workers > 1
+    """
+    datasets = bundle_datasets(bundle)
+    try:
+        if workers > 1 and len(datasets) > 1:
+            with ThreadPoolExecutor(max_workers=min(workers, len(datasets)), thread_name_prefix=f'load-{bundle}') as pool:
+                return _tuples[bundle](*pool.map(load_dataset, datasets))
+        return _tuples[bundle](*(load_dataset(name) for name in datasets))
+    except Exception as e:
+        logger.error(f"error loading bundle '{bundle}': {str(e)}")
+        raise
@@ -0,0 +1,118 @@
+"""
+Pre-aggregated incident cube.
+
+The cube holds month-level incident counts keyed by
+month_year x Agency x Crime Name1 x Crime Name2 x match_status x category x Police_district_Number
+(built by pipeline/cube.py). Every dimension is kept as integer category codes,
+so a rollup to any set of dimensions is a ravel of the codes plus a bincount,
+without a pandas groupby over strings.
+
+The same class wraps any frame of dimension columns plus a 'count' column,
+which is how the linemap_* extracts are handled when the cube artifact has not
+been built.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from data_service.registry import load_dataset, local_path
+
+logger = logging.getLogger(__name__)
+
+CUBE_DIMENSIONS = ['month_year', 'Agency', 'Crime Name1', 'Crime Name2', 'match_status', 'category',
+                   'Police_district_Number']
+MEASURE = 'count'
+
+
+class IncidentCube:
+    """
+    Count cube with categorical dimensions, see rollup and slice
+    """
+
+    def __init__(self, frame, measure=MEASURE):
+        self.measure = measure
+        self.dimensions = [col for col in frame.columns if col != measure]
+        not_categorical = [col for col in self.dimensions if not isinstance(frame[col].dtype, pd.CategoricalDtype)]
+        if not_categorical:
+            frame = frame.astype({col: 'category' for col in not_categorical})
+        self.frame = frame
+        self.categories = {dim: frame[dim].cat.categories for dim in self.dimensions}
+        self.codes = {dim: frame[dim].cat.codes.to_numpy() for dim in self.dimensions}
+        self.values = frame[measure].to_numpy()
+
+    @classmethod
+    def from_frame(cls, df, measure=MEASURE):
+        return cls(df, measure)
+
+    def __len__(self):
+        return len(self.frame)
+
+    def members(self, dim):
+        """
+        Values of a dimension that occur in the cube
+        """
+        present = np.unique(self.codes[dim][self.codes[dim] >= 0])
+        return self.categories[dim][present]
+
+    def _mask(self, filters=None):
+        mask = np.ones(len(self.frame), dtype=bool)
+        for dim, allowed in (filters or {}).items():
+            if np.isscalar(allowed):
+                allowed = [allowed]
+            positions = self.categories[dim].get_indexer(list(allowed))
+            mask &= np.isin(self.codes[dim], positions[positions >= 0])
+        return mask
+
+    def slice(self, filters):
+        """
+        Sub-cube with only the rows whose dimensions are in filters ({dim: values})
+        """
+        return IncidentCube(self.frame[self._mask(filters)], self.measure)
+
+    def rollup(self, dims, filters=None):
+        """
+        Sums the measure over every dimension not in dims.
+
+        Rows where one of dims is missing are left out, like a pandas groupby.
+        Returns a frame of dims + measure sorted by dims, a single row with the
+        (filtered) grand total when dims is empty.
+        """
+        mask = self._mask(filters)
+        if not dims:
+            return pd.DataFrame({self.measure: [self.values[mask].sum()]})
+        for dim in dims:
+            mask &= self.codes[dim] >= 0
+        codes = [self.codes[dim][mask] for dim in dims]
+        shape = [len(self.categories[dim]) for dim in dims]
+
+        if len(codes[0]) == 0:
+            flat_keys = np.array([], dtype=np.int64)
+            sums = np.array([], dtype=self.values.dtype)
+        else:
+            flat = np.ravel_multi_index(codes, shape)
+            flat_keys, inverse = np.unique(flat, return_inverse=True)
+            sums = np.bincount(inverse, weights=self.values[mask], minlength=len(flat_keys))
+        if np.issubdtype(self.values.dtype, np.integer):
+            sums = sums.astype(self.values.dtype)
+
+        result = {}
+        for dim, dim_codes in zip(dims, np.unravel_index(flat_keys, shape)):
+            categories = self.categories[dim]
+            if pd.api.types.is_datetime64_any_dtype(categories):
+                # Time stays a plain datetime column for the charts
+                result[dim] = categories.take(dim_codes)
+            else:
+                result[dim] = pd.Categorical.from_codes(dim_codes, categories=categories)
+        result[self.measure] = sums
+        return pd.DataFrame(result)
+
+
+def load_cube():
+    """
+    The incident cube built by pipeline/cube.py, or None when it has not been built
+    """
+    if not local_path('incident_cube').exists():
+        logger.debug('incident cube not built, using the linemap extracts')
+        return None
+    return IncidentCube(load_dataset('incident_cube'))
@@ -0,0 +1,98 @@
+"""
+Reduces chart data before it is sent to the browser.
+
+Two steps, both optional:
+
+- cap_series keeps the top-K series by total volume and sums the rest into one
+  'Other' series, so a 55 value dimension such as Crime Name2 does not become
+  55 lines x 4 Altair layers.
+- downsample_series applies Largest-Triangle-Three-Buckets per series once a
+  series has more points than max_points, which keeps peaks and dips that plain
+  decimation would drop.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+OTHER_LABEL = 'Other'
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Positions of the n_out points LTTB keeps from the series (x, y), x sorted ascending
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    bucket_size = (n - 2) / (n_out - 2)
+
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0] = 0
+    previous = 0
+    for i in range(n_out - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        # Average of the next bucket (for the last bucket that is the final point)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        kept[i + 1] = previous
+    kept[-1] = n - 1
+    return kept
+
+
+def cap_series(df, series_col, value_col='count', top_k=10, other_label=OTHER_LABEL):
+    """
+    Keeps the top_k series by total value, the remaining ones are summed into other_label
+    """
+    totals = df.groupby(series_col, observed=True)[value_col].sum()
+    if len(totals) <= top_k:
+        return df
+    keep = totals.nlargest(top_k).index
+    group_cols = [col for col in df.columns if col not in (series_col, value_col)]
+    series = df[series_col].astype(object).where(df[series_col].isin(keep), other_label)
+    capped = (
+        df.assign(**{series_col: series})
+        .groupby(group_cols + [series_col], observed=True)[value_col]
+        .sum()
+        .reset_index()
+    )
+    logger.debug(f'{series_col}: {len(totals)} series capped to {top_k} + {other_label}')
+    return capped
+
+
+def downsample_series(df, series_col, time_col='month_year', value_col='count', max_points=120):
+    """
+    LTTB per series, applied only to series longer than max_points
+    """
+    parts = []
+    for _, part in df.sort_values(time_col).groupby(series_col, observed=True, sort=False):
+        if len(part) > max_points:
+            x = part[time_col].to_numpy().astype('datetime64[ns]').astype('int64') \
+                if pd.api.types.is_datetime64_any_dtype(part[time_col]) else part[time_col].to_numpy()
+            part = part.iloc[lttb_indices(x, part[value_col].to_numpy(), max_points)]
+        parts.append(part)
+    if not parts:
+        return df
+    return pd.concat(parts, ignore_index=True)
+
+
+def reduce_for_rendering(df, series_col, time_col='month_year', value_col='count', max_series=None, max_points=None):
+    """
+    Applies the series cap and then the per series downsampling, each when its limit is set
+    """
+    if max_series is not None:
+        df = cap_series(df, series_col, value_col, top_k=max_series)
+    if max_points is not None:
+        df = downsample_series(df, series_col, time_col, value_col, max_points=max_points)
+    return df
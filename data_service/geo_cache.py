@@ -0,0 +1,221 @@
+"""
+Process-wide cache of the parsed tract geometry.
+
+The scattermap TopoJSON never changes between reruns, yet the geographic page
+used to parse it and embed the whole GeoDataFrame (geometry included) in the
+scatter and lookup data on every crime type switch. Here the file is parsed
+once per process into a GeometryLayer that keeps the geometry and the
+attribute table apart; pages ask it for the few attribute columns they chart.
+
+The layer is keyed on the SHA-256 of the file contents. A cheap stat check
+(mtime, size) decides when to re-hash, and the file is only re-parsed when the
+hash actually changed. Reading and parsing happen under a lock per dataset
+name, so a slow fetch of one file does not hold up the others. Layers are
+shared between sessions and must be treated as read-only.
+"""
+from pathlib import Path
+import hashlib
+import io
+import logging
+import threading
+import urllib.request
+
+import altair as alt
+import pandas as pd
+
+from data_service.registry import READERS, browser_url, resolve
+from data_service.tract_index import TractIndex
+
+logger = logging.getLogger(__name__)
+
+KEY = 'tract'
+
+# Simplified copies of the tract layer, coarsest first (built by pipeline/simplify.py).
+# tolerance is the Douglas-Peucker tolerance in degrees, quantization the TopoJSON grid size.
+GEOMETRY_LEVELS = {
+    'low': {'tolerance': 0.0007, 'quantization': 2_000},
+    'medium': {'tolerance': 0.0002, 'quantization': 10_000},
+    'high': {'tolerance': 0.00005, 'quantization': 100_000},
+}
+FULL_LEVEL = 'full'
+
+_layers = {}
+_hashes = {}
+# One lock per dataset name around reading and parsing, _lock only guards the dicts
+_name_locks = {}
+_lock = threading.Lock()
+
+
+class GeometryLayer:
+    """
+    Parsed TopoJSON split into a geometry table and an attribute table
+    """
+
+    def __init__(self, name, content_hash, frame, key=KEY):
+        self.name = name
+        self.content_hash = content_hash
+        self.key = key
+        self.geometry = frame[[key, 'geometry']]
+        self.attributes = pd.DataFrame(frame.drop(columns='geometry'))
+        self.bbox = tuple(frame.total_bounds)
+        # Exclusion masks of the tract groups in config/tract_groups.json
+        self.index = TractIndex.from_config(self.attributes[key])
+        self._subsets = {}
+
+    def __len__(self):
+        return len(self.attributes)
+
+    def subset(self, exclude=()):
+        """
+        Attribute rows outside the excluded tract groups, cached per combination
+        """
+        key = frozenset(exclude)
+        if not key:
+            return self.attributes
+        if key not in self._subsets:
+            self._subsets[key] = self.attributes[self.index.keep_mask(key)]
+        return self._subsets[key]
+
+    def columns(self, columns, exclude=()):
+        """
+        The key plus the requested attribute columns, no geometry, without the excluded tract groups
+        """
+        missing = [col for col in columns if col not in self.attributes.columns]
+        if missing:
+            raise KeyError(f'{missing} not in {self.name}')
+        return self.subset(exclude)[[self.key, *columns]]
+
+def _stamp(source):
+    path = Path(source)
+    if not path.exists():
+        return None
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read_bytes(source):
+    path = Path(source)
+    if path.exists():
+        return path.read_bytes()
+    with urllib.request.urlopen(source) as response:
+        return response.read()
+
+
+def _name_lock(name):
+    with _lock:
+        return _name_locks.setdefault(name, threading.Lock())
+
+
+def _fresh(cache, name, stamp):
+    with _lock:
+        cached = cache.get(name)
+    # A remote copy cannot be stat'ed, once fetched it is kept for the process
+    if cached is not None and (stamp is None or cached[0] == stamp):
+        return cached, True
+    return cached, False
+
+
+def load_geometry(name='scattermap_topo'):
+    """
+    The GeometryLayer of a TopoJSON dataset, parsed at most once per file content
+    """
+    source, reader = resolve(name)
+    stamp = _stamp(source)
+    cached, fresh = _fresh(_layers, name, stamp)
+    if fresh:
+        return cached[1]
+
+    with _name_lock(name):
+        # Another session may have parsed it while this one waited
+        cached, fresh = _fresh(_layers, name, stamp)
+        if fresh:
+            return cached[1]
+
+        try:
+            content = _read_bytes(source)
+        except Exception as e:
+            logger.error(f"error reading '{name}' from {source}: {str(e)}")
+            raise
+        content_hash = hashlib.sha256(content).hexdigest()
+        if cached is not None and cached[1].content_hash == content_hash:
+            # Touched but not changed
+            with _lock:
+                _layers[name] = (stamp, cached[1])
+            return cached[1]
+
+        try:
+            frame = READERS[reader](io.BytesIO(content), None)
+        except Exception as e:
+            logger.error(f"error parsing '{name}': {str(e)}")
+            raise
+        layer = GeometryLayer(name, content_hash, frame)
+        logger.debug(f"parsed '{name}' ({len(layer)} features, sha256 {content_hash[:12]})")
+        with _lock:
+            _layers[name] = (stamp, layer)
+        return layer
+
+
+def content_hash(name):
+    """
+    SHA-256 of a dataset's file without parsing it, re-hashed only when its mtime or size changed
+    """
+    source, _ = resolve(name)
+    stamp = _stamp(source)
+    cached, fresh = _fresh(_hashes, name, stamp)
+    if fresh:
+        return cached[1]
+
+    with _name_lock(name):
+        cached, fresh = _fresh(_hashes, name, stamp)
+        if fresh:
+            return cached[1]
+        try:
+            digest = hashlib.sha256(_read_bytes(source)).hexdigest()
+        except Exception as e:
+            logger.error(f"error reading '{name}' from {source}: {str(e)}")
+            raise
+        with _lock:
+            _hashes[name] = (stamp, digest)
+        return digest
+
+
+def topo_feature(name, feature='data'):
+    """
+    Altair topo_feature the browser fetches itself, the URL carries the content
+    hash so browsers refetch only when the file changed
+    """
+    return alt.topo_feature(f'{browser_url(name)}?v={content_hash(name)[:12]}', feature=feature)
+
+
+def level_dataset(name, level):
+    """
+    Dataset name of one simplification level of a TopoJSON dataset
+    """
+    return name if level == FULL_LEVEL else f'{name}_{level}'
+
+
+def pick_level(width, height, bbox, zoom=1.0):
+    """
+    Coarsest level whose tolerance stays under half a rendered pixel.
+
+    bbox is (min_x, min_y, max_x, max_y) in degrees, width and height the chart
+    size in pixels; zoom scales the rendered size.
+    """
+    degrees_per_pixel = max((bbox[2] - bbox[0]) / (width * zoom), (bbox[3] - bbox[1]) / (height * zoom))
+    for level, settings in GEOMETRY_LEVELS.items():
+        if settings['tolerance'] <= degrees_per_pixel / 2:
+            return level
+    return FULL_LEVEL
+
+
+def clear_geometry(name=None):
+    """
+    Drops one cached layer and file hash, or all of them when no name is given
+    """
+    with _lock:
+        if name is None:
+            _layers.clear()
+            _hashes.clear()
+        else:
+            _layers.pop(name, None)
+            _hashes.pop(name, None)
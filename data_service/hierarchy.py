@@ -0,0 +1,66 @@
+"""
+Plotly treemap / sunburst hierarchy from a column path.
+
+The treemap pages used to build labels / parents / values with a loop over the
+top level and iterrows over each group. build_hierarchy counts (or sums) the
+rows once at the deepest level of the path and rolls that small result up one
+level at a time, so each level is a single groupby and the node arrays are
+built with vectorized string concatenation.
+
+Node ids are the full path (root, level 1 value, level 2 value, ...) joined
+with an ASCII unit separator, so a child with the same label as its parent or
+as a node elsewhere in the tree stays a distinct node.
+"""
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SEP = '\x1f'
+
+
+def build_hierarchy(df, path, value=None, root=None, dropna=True):
+    """
+    Treemap nodes for the column path as a frame of ids, labels, parents and values.
+
+    value is a column to sum, rows are counted when it is None. root adds a
+    single top node with the grand total. Rows with a missing value anywhere on
+    the path are dropped when dropna is True, like a default groupby.
+    """
+    path = list(path)
+    if value is None:
+        leaves = df.groupby(path, observed=True, dropna=dropna).size()
+    else:
+        leaves = df.groupby(path, observed=True, dropna=dropna)[value].sum()
+    leaves = leaves.rename('values').reset_index()
+
+    root_id = None if root is None else str(root)
+    levels = []
+    for depth in range(len(path), 0, -1):
+        cols = path[:depth]
+        if depth == len(path):
+            level = leaves
+        else:
+            level = leaves.groupby(cols, observed=True, dropna=False)['values'].sum().reset_index()
+        keys = [level[col].astype(str) for col in cols]
+        parents = pd.Series('' if root_id is None else root_id, index=level.index)
+        ids = keys[0] if root_id is None else root_id + SEP + keys[0]
+        for key in keys[1:]:
+            parents = ids
+            ids = ids + SEP + key
+        levels.append(pd.DataFrame({
+            'ids': ids.to_numpy(),
+            'labels': keys[-1].to_numpy(),
+            'parents': parents.to_numpy(),
+            'values': level['values'].to_numpy(),
+        }))
+
+    if root_id is not None:
+        levels.append(pd.DataFrame({
+            'ids': [root_id], 'labels': [root_id], 'parents': [''], 'values': [leaves['values'].sum()],
+        }))
+    # Top of the tree first, the order plotly draws in
+    nodes = pd.concat(levels[::-1], ignore_index=True)
+    logger.debug(f'hierarchy {path}: {len(nodes)} nodes')
+    return nodes
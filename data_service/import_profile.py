@@ -0,0 +1,104 @@
+"""
+Import-time profile of the dashboard pages.
+
+Each page's module-level imports are read from its source and run in a fresh
+interpreter with -X importtime, so the report shows what a cold start of that
+page pays before it can draw anything. Costs are attributed like -X importtime
+does: a package shared by two imports (pandas, say) is charged to the first
+one that pulls it in.
+
+    python -m data_service.import_profile                 every page
+    python -m data_service.import_profile pages/treemap.py
+
+capstone.py shows the same report when opened with ?profile=imports.
+"""
+from pathlib import Path
+import ast
+import logging
+import os
+import re
+import subprocess
+import sys
+
+import pandas as pd
+
+from data_service.registry import REPO_ROOT
+
+logger = logging.getLogger(__name__)
+
+PAGES = ['capstone.py', *sorted(str(path.relative_to(REPO_ROOT)) for path in (REPO_ROOT / 'pages').glob('*.py'))]
+
+# import time:       763 |     834551 | geopandas
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def page_imports(path):
+    """
+    The import statements at the top level of a page, in source order
+    """
+    source = Path(REPO_ROOT / path).read_text(encoding='utf-8')
+    tree = ast.parse(source)
+    return [ast.get_source_segment(source, node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def parse_importtime(stderr):
+    """
+    -X importtime output as a frame of module, depth, self_ms, cumulative_ms
+    """
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append({
+                'module': module,
+                'depth': len(indent) // 2,
+                'self_ms': int(self_us) / 1000,
+                'cumulative_ms': int(cumulative_us) / 1000,
+            })
+    return pd.DataFrame(rows, columns=['module', 'depth', 'self_ms', 'cumulative_ms'])
+
+
+def measure_imports(statements):
+    """
+    Runs the import statements in a fresh interpreter and returns the parsed -X importtime output
+    """
+    env = {**os.environ, 'PYTHONPATH': str(REPO_ROOT)}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', '\n'.join(statements)],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'import failed: {result.stderr.strip().splitlines()[-1]}')
+    return parse_importtime(result.stderr)
+
+
+def import_report(path, top=None):
+    """
+    Cumulative cost of each top-level package a page imports, most expensive first
+    """
+    try:
+        timings = measure_imports(page_imports(path))
+    except Exception as e:
+        logger.error(f'error profiling the imports of {path}: {str(e)}')
+        raise
+    # Modules the interpreter loads before running any code (site, encodings, ...) are not the page's
+    startup = set(measure_imports(['pass'])['module'])
+    report = timings[(timings['depth'] == 0) & ~timings['module'].isin(startup)]
+    report = report.sort_values('cumulative_ms', ascending=False).reset_index(drop=True)
+    report.attrs['total_ms'] = report['cumulative_ms'].sum()
+    return report if top is None else report.head(top)
+
+
+def page_reports(pages=PAGES, top=10):
+    """
+    {page: import_report} for every page
+    """
+    return {page: import_report(page, top) for page in pages}
+
+
+if __name__ == '__main__':
+    for page, report in page_reports(sys.argv[1:] or PAGES).items():
+        print(f"{page}: {report.attrs['total_ms']:.0f} ms")
+        print(report[['module', 'self_ms', 'cumulative_ms']].to_string(index=False, float_format='%.1f'))
+        print()
@@ -0,0 +1,154 @@
+"""
+Speculative prefetch of the options next to the one on screen.
+
+Someone looking at 'Agency' on the timeseries page or 'theft' on the
+geographic page is likely to pick the neighbouring option next. After a page
+has drawn its chart it hands the neighbours' chart builders to its session's
+SessionPrefetcher, which runs them on a small thread pool shared by every
+session while the user reads the current chart. The builders go through
+chart_cache (data_service/aggregation_cache.py), so the page's next run finds
+the chart and its aggregates there.
+
+Concurrency is bounded twice: PREFETCH_WORKERS threads for the whole process,
+and at most MAX_PENDING queued tasks per session (MAX_QUEUED overall). A
+session that moves on cancels its queued tasks for options that are no longer
+adjacent. When a session ends its SessionPrefetcher is dropped with the rest
+of st.session_state, and a weakref finalizer cancels whatever it still had
+queued. A task that has already started runs to completion, its result only
+goes into the shared caches.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import weakref
+
+import streamlit as st
+
+from data_service.aggregation_cache import chart_cache
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_WORKERS = 2
+MAX_PENDING = 4
+MAX_QUEUED = 16
+SESSION_KEY = '_prefetcher'
+
+
+def adjacent_options(options, current, distance=1):
+    """
+    The options up to distance places before and after current, nearest first
+    """
+    options = list(options)
+    if current not in options:
+        return []
+    i = options.index(current)
+    neighbours = []
+    for step in range(1, distance + 1):
+        neighbours += [options[j] for j in (i + step, i - step) if 0 <= j < len(options)]
+    return neighbours
+
+
+class PrefetchScheduler:
+    """
+    Process-wide pool running prefetch tasks, one task per key at a time
+    """
+
+    def __init__(self, max_workers=PREFETCH_WORKERS, max_queued=MAX_QUEUED):
+        self.max_queued = max_queued
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, task):
+        """
+        Queues task() unless key is cached, already queued or the queue is full; returns the future or None
+        """
+        if key in chart_cache:
+            return None
+        with self._lock:
+            if key in self._inflight or len(self._inflight) >= self.max_queued:
+                return None
+            future = self._pool.submit(self._run, key, task)
+            self._inflight[key] = future
+        return future
+
+    def _run(self, key, task):
+        failed = False
+        try:
+            task()
+        except Exception as e:
+            failed = True
+            logger.warning(f'prefetch of {key} failed: {str(e)}')
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if failed:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+
+    def cancel(self, futures):
+        """
+        Cancels the futures that have not started yet
+        """
+        for key, future in list(futures.items()):
+            if future.cancel():
+                with self._lock:
+                    self._inflight.pop(key, None)
+                    self.cancelled += 1
+            futures.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': len(self._inflight),
+                'completed': self.completed,
+                'failed': self.failed,
+                'cancelled': self.cancelled,
+            }
+
+
+class SessionPrefetcher:
+    """
+    The prefetch tasks one session has queued, cancelled when the session goes away
+    """
+
+    def __init__(self, scheduler, max_pending=MAX_PENDING):
+        self.scheduler = scheduler
+        self.max_pending = max_pending
+        self.futures = {}
+        # Must not reference self, or the prefetcher would never be collected
+        weakref.finalize(self, scheduler.cancel, self.futures)
+
+    def prefetch(self, tasks):
+        """
+        Replaces the queued work with tasks ({key: callable}, most likely first)
+        """
+        wanted = dict(list(tasks.items())[:self.max_pending])
+        # Tasks for options that are no longer next to the current one
+        self.scheduler.cancel({key: future for key, future in self.futures.items() if key not in wanted})
+        for key in [key for key, future in self.futures.items() if future.done() or key not in wanted]:
+            self.futures.pop(key, None)
+        for key, task in wanted.items():
+            if key not in self.futures:
+                future = self.scheduler.submit(key, task)
+                if future is not None:
+                    self.futures[key] = future
+
+    def cancel(self):
+        self.scheduler.cancel(self.futures)
+
+
+scheduler = PrefetchScheduler()
+
+
+def session_prefetcher():
+    """
+    The SessionPrefetcher of the running session, kept in st.session_state
+    """
+    if SESSION_KEY not in st.session_state:
+        st.session_state[SESSION_KEY] = SessionPrefetcher(scheduler)
+    return st.session_state[SESSION_KEY]
@@ -0,0 +1,217 @@
+"""
+Dataset registry for the dashboards.
+
+Every dataset the pages use is known by a short logical name (for example
+'linemap_cn1cn2' or 'scattermap_topo'). The registry resolves that name to the
+file in this repository first and only falls back to the GitHub raw copy when
+the file is not checked out locally. When a Parquet copy of a CSV artifact has
+been built next to it (see pipeline/artifacts.py) and is not older than the
+CSV, that copy is read instead, with the column types declared in
+data_service/schemas.py.
+
+Parsed frames are kept in st.cache_resource, keyed on the dataset name and the
+version of its file (dataset_version). Every page and every rerun of every
+session gets the same object, a changed file is parsed again, and the cache is
+emptied with the rest of Streamlit's caches. Callers must treat the returned
+frames as read-only.
+"""
+from pathlib import Path
+import json
+import logging
+
+import pandas as pd
+import streamlit as st
+
+from data_service.schemas import SCHEMAS, read_typed_csv
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+CONFIG_DIR = REPO_ROOT / 'config'
+REMOTE_BASE_URL = 'https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/'
+# Files under static/ are served by streamlit itself (.streamlit/config.toml), relative to the page
+STATIC_DIR = REPO_ROOT / 'static'
+STATIC_URL = 'app/static/'
+
+# logical name -> (file name, reader)
+DATASETS = {
+    # Time series extracts
+    'linemap_agecn1': ('capstone_streamlit_linemap_agecn1.csv', 'csv'),
+    'linemap_agecn2': ('capstone_streamlit_linemap_agecn2.csv', 'csv'),
+    'linemap_agesum': ('capstone_streamlit_linemap_agesum.csv', 'csv'),
+    'linemap_catsum': ('capstone_streamlit_linemap_catsum.csv', 'csv'),
+    'linemap_cn1cn2': ('capstone_streamlit_linemap_cn1cn2.csv', 'csv'),
+    'linemap_cn2': ('capstone_streamlit_linemap_cn2.csv', 'csv'),
+    'linemap_victims': ('capstone_streamlit_linemap_victims.csv', 'csv'),
+    'crime_ns2_dash': ('crime_ns2_dash.csv', 'csv'),
+    'incident_cube': ('capstone_streamlit_incident_cube.parquet', 'parquet'),
+    # Treemap
+    'treemap': ('capstone_streamlit_treemap.csv', 'csv'),
+    # Geographic
+    'scattermap': ('capstone_streamlit_scattermap.csv', 'csv'),
+    'scattermap_topo': ('capstone_streamlit_scattermap_topo.json', 'topojson'),
+    # Simplified + quantized copies of the tract layer (pipeline/simplify.py), served by streamlit from static/
+    'scattermap_topo_low': ('static/capstone_streamlit_scattermap_topo_low.json', 'topojson'),
+    'scattermap_topo_medium': ('static/capstone_streamlit_scattermap_topo_medium.json', 'topojson'),
+    'scattermap_topo_high': ('static/capstone_streamlit_scattermap_topo_high.json', 'topojson'),
+    # Short extracts shown on the data breakdown page
+    'dispatch_short': ('capstone_streamlit_dispatch_short.csv', 'csv'),
+    'crime_short': ('capstone_streamlit_crime_short.csv', 'csv'),
+    'census_short': ('capstone_streamlit_census_short.csv', 'csv'),
+    'joined_short': ('capstone_streamlit_joined_short.csv', 'csv'),
+    'treemap_short': ('capstone_streamlit_treemap_short.csv', 'csv'),
+    'choropleth1_short': ('capstone_streamlit_choropleth1_short.csv', 'csv'),
+    'choropleth2_short': ('capstone_streamlit_choropleth2_short.csv', 'csv'),
+    'linemap_short': ('capstone_streamlit_linemap_short.csv', 'csv'),
+    'line_short': ('capstone_streamlit_line_short.csv', 'csv'),
+}
+
+def _read_csv(source, schema):
+    if schema is None:
+        return pd.read_csv(source)
+    return read_typed_csv(source, schema)
+
+
+def _read_parquet(source, schema):
+    return pd.read_parquet(source)
+
+
+def _read_topojson(source, schema):
+    # geopandas is only needed by the geographic page, so it is imported here
+    import geopandas as gpd
+    return gpd.read_file(source, driver='TopoJSON')
+
+
+READERS = {
+    'csv': _read_csv,
+    'parquet': _read_parquet,
+    'topojson': _read_topojson,
+}
+
+
+def _entry(name):
+    if name not in DATASETS:
+        raise KeyError(f"Unknown dataset '{name}'")
+    return DATASETS[name]
+
+
+def local_path(name):
+    """
+    Path of the dataset inside the repository (it may not exist)
+    """
+    file_name, _ = _entry(name)
+    return REPO_ROOT / file_name
+
+
+def parquet_path(name):
+    """
+    Path of the Parquet copy of a CSV artifact (it may not exist)
+    """
+    return local_path(name).with_suffix('.parquet')
+
+
+def remote_url(name):
+    """
+    GitHub raw URL of the dataset, needed where the browser fetches the file itself
+    """
+    file_name, _ = _entry(name)
+    return REMOTE_BASE_URL + file_name
+
+
+def browser_url(name):
+    """
+    URL the browser fetches a dataset from: the app's own static/ route for files
+    checked out there, the GitHub raw URL otherwise
+    """
+    path = local_path(name)
+    if STATIC_DIR in path.parents and path.exists():
+        return STATIC_URL + path.relative_to(STATIC_DIR).as_posix()
+    return remote_url(name)
+
+
+def _local_source(name):
+    """
+    (path, reader) of the local file a dataset is read from, None when nothing is checked out.
+    The Parquet copy is only used while it is at least as new as its CSV, a CSV
+    regenerated after the last pipeline.artifacts run is read directly.
+    """
+    _, reader = _entry(name)
+    path, parquet = local_path(name), parquet_path(name)
+    if reader == 'csv' and parquet.exists():
+        if not path.exists() or parquet.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+            return parquet, 'parquet'
+    if path.exists():
+        return path, reader
+    return None
+
+
+def resolve(name):
+    """
+    Returns (source, reader): the Parquet copy when it is up to date,
+    the local file when it is checked out, the GitHub raw URL otherwise
+    """
+    local = _local_source(name)
+    if local is not None:
+        if local[0] != parquet_path(name) and parquet_path(name).exists():
+            logger.warning(f"{parquet_path(name).name} is older than its CSV, reading the CSV (rerun pipeline.artifacts)")
+        return str(local[0]), local[1]
+    logger.warning(f"'{name}' not found locally, falling back to {remote_url(name)}")
+    return remote_url(name), _entry(name)[1]
+
+
+def dataset_version(name):
+    """
+    Version stamp of the file a dataset is read from (the one resolve picks): name,
+    mtime and size of the local copy, the URL for the remote fallback (fetched once per process)
+    """
+    local = _local_source(name)
+    if local is None:
+        return remote_url(name)
+    stat = local[0].stat()
+    return f'{local[0].name}:{stat.st_mtime_ns}:{stat.st_size}'
+
+
+def read_dataset(name):
+    """
+    Parses a dataset from wherever it resolves to, without caching
+    """
+    source, reader = resolve(name)
+    try:
+        data = READERS[reader](source, SCHEMAS.get(name))
+    except Exception as e:
+        logger.error(f"error loading '{name}' from {source}: {str(e)}")
+        raise
+    logger.debug(f"loaded '{name}' from {source} ({len(data)} rows)")
+    return data
+
+
+# st.cache_resource locks per key, so two sessions asking for different files do not wait on each other.
+# Room for one entry per dataset, entries of a replaced file age out.
+@st.cache_resource(show_spinner=False, max_entries=len(DATASETS))
+def _cached_dataset(name, version):
+    return read_dataset(name)
+
+
+def load_dataset(name):
+    """
+    Loads a dataset by logical name, parsing it at most once per version of its file
+    """
+    return _cached_dataset(name, dataset_version(name))
+
+
+def load_config(file_name):
+    """
+    Reads one of the versioned JSON files in config/
+    """
+    with open(CONFIG_DIR / file_name, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def clear_cache(name=None):
+    """
+    Drops the current version of one cached dataset, or every cached dataset when no name is given
+    """
+    if name is None:
+        _cached_dataset.clear()
+    else:
+        _cached_dataset.clear(name, dataset_version(name))
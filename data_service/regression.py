@@ -0,0 +1,174 @@
+"""
+Closed-form crime vs dispatch regression for every crime type and tract filter.
+
+The geographic page fits crime_<type> ~ dispatch_<type> over the census
+tracts shown. With X and Y the (types x tracts) count matrices and W the
+(filters x tracts) keep masks of every combination of tract groups, the sums
+W @ X, W @ Y, W @ X², W @ XY and W @ Y² give slope, intercept and R² of all
+types x filters at once:
+
+    slope = Sxy' / Sxx'    intercept = (Sy - slope Sx) / n    R² = Sxy'² / (Sxx' Syy')
+
+(primed sums are centred). This is the ordinary least squares fit and its
+in-sample r2_score, without scikit-learn. Results are cached per geometry
+layer content hash.
+
+Bootstrap confidence intervals reuse the same formula: a resample of the
+tracts is a row of multinomial counts, so B resamples are a (B x tracts)
+weight matrix and all of them are fitted in one batched_ols call.
+"""
+from itertools import combinations
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CRIME_COLUMN = 'crime_{}'
+DISPATCH_COLUMN = 'dispatch_{}'
+
+EPS = 1e-12
+N_RESAMPLES = 2000
+CONFIDENCE = 0.95
+BAND_POINTS = 100
+
+_tables = {}
+_bootstraps = {}
+_lock = threading.Lock()
+
+
+def filter_combinations(groups):
+    """
+    Every subset of the tract groups, as frozensets, the empty set first
+    """
+    groups = list(groups)
+    return [frozenset(combo) for size in range(len(groups) + 1) for combo in combinations(groups, size)]
+
+
+def filter_label(excluded):
+    """
+    Index label of a set of excluded tract groups ('' for none)
+    """
+    return ','.join(sorted(excluded))
+
+
+def batched_ols(X, Y, W):
+    """
+    OLS of Y on X per row, for every keep mask in W.
+
+    X, Y are (types x tracts), W is (filters x tracts) of 0/1.
+    Returns slope, intercept, r2 and n, each (filters x types).
+    """
+    X = np.asarray(X, dtype='float64')
+    Y = np.asarray(Y, dtype='float64')
+    W = np.asarray(W, dtype='float64')
+
+    n = W.sum(axis=1)[:, None]
+    sx, sy = W @ X.T, W @ Y.T
+    sxx, syy, sxy = W @ (X * X).T, W @ (Y * Y).T, W @ (X * Y).T
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx * sy / n
+        # Rounding can leave a constant column with a tiny non-zero variance
+        flat_x = np.abs(sxx - sx * sx / n) <= EPS * np.maximum(sxx, 1)
+        flat_y = np.abs(syy - sy * sy / n) <= EPS * np.maximum(syy, 1)
+        var_x = np.where(flat_x, 1.0, sxx - sx * sx / n)
+        var_y = np.where(flat_y, 1.0, syy - sy * sy / n)
+        # Like LinearRegression / r2_score: a constant x fits a flat line at the mean of y,
+        # a constant y is predicted perfectly
+        slope = np.where(flat_x, 0.0, cov / var_x)
+        intercept = (sy - slope * sx) / n
+        r2 = np.where(flat_y, 1.0, np.where(flat_x, 0.0, cov * cov / (var_x * var_y)))
+    return slope, intercept, r2, np.broadcast_to(n, slope.shape)
+
+
+class RegressionTable:
+    """
+    slope, intercept, r2 and n per (excluded tract groups, crime type)
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+
+    def get(self, crime_type, excluded=()):
+        return self.frame.loc[(filter_label(excluded), crime_type)].to_dict()
+
+
+def compute_regressions(attributes, crime_types, index):
+    """
+    Fits every crime type under every combination of the index's tract groups in one pass
+    """
+    X = attributes[[DISPATCH_COLUMN.format(crime) for crime in crime_types]].to_numpy().T
+    Y = attributes[[CRIME_COLUMN.format(crime) for crime in crime_types]].to_numpy().T
+    filters = filter_combinations(index.masks)
+    W = np.vstack([index.keep_mask(excluded) for excluded in filters])
+
+    slope, intercept, r2, n = batched_ols(X, Y, W)
+    rows = pd.MultiIndex.from_product(
+        [[filter_label(excluded) for excluded in filters], list(crime_types)], names=['excluded', 'crime_type']
+    )
+    frame = pd.DataFrame({
+        'slope': slope.ravel(),
+        'intercept': intercept.ravel(),
+        'r2': r2.ravel(),
+        'n': n.ravel().astype(int),
+    }, index=rows)
+    return RegressionTable(frame)
+
+
+def regression_table(layer, crime_types):
+    """
+    The cached RegressionTable of a GeometryLayer (see data_service/geo_cache.py)
+    """
+    key = (layer.name, layer.content_hash, tuple(crime_types))
+    with _lock:
+        if key not in _tables:
+            _tables[key] = compute_regressions(layer.attributes, crime_types, layer.index)
+            logger.debug(f'regressions for {len(crime_types)} crime types computed ({layer.content_hash[:12]})')
+        return _tables[key]
+
+
+def bootstrap_regressions(attributes, crime_types, keep_mask, n_resamples=N_RESAMPLES, confidence=CONFIDENCE, seed=0):
+    """
+    Percentile bootstrap of the fit for every crime type over the kept tracts.
+
+    Returns {crime_type: {'slope_ci', 'r2_ci', 'band'}} where band is a frame of
+    x, low, high for the regression line over the observed dispatch range.
+    """
+    kept = attributes[keep_mask]
+    X = kept[[DISPATCH_COLUMN.format(crime) for crime in crime_types]].to_numpy(dtype='float64').T
+    Y = kept[[CRIME_COLUMN.format(crime) for crime in crime_types]].to_numpy(dtype='float64').T
+    n = X.shape[1]
+
+    rng = np.random.default_rng(seed)
+    W = rng.multinomial(n, np.full(n, 1 / n), size=n_resamples)
+    slope, intercept, r2, _ = batched_ols(X, Y, W)
+
+    tails = [(1 - confidence) / 2 * 100, (1 + confidence) / 2 * 100]
+    results = {}
+    for i, crime in enumerate(crime_types):
+        x_grid = np.linspace(X[i].min(), X[i].max(), BAND_POINTS)
+        lines = intercept[:, i, None] + slope[:, i, None] * x_grid
+        low, high = np.percentile(lines, tails, axis=0)
+        results[crime] = {
+            'slope_ci': tuple(np.percentile(slope[:, i], tails)),
+            'r2_ci': tuple(np.percentile(r2[:, i], tails)),
+            'band': pd.DataFrame({'x': x_grid, 'low': low, 'high': high}),
+        }
+    return results
+
+
+def bootstrap_intervals(layer, crime_types, crime_type, excluded=(), n_resamples=N_RESAMPLES, confidence=CONFIDENCE):
+    """
+    Cached bootstrap result of one crime type, all crime types of the filter set are computed together
+    """
+    key = (layer.name, layer.content_hash, tuple(crime_types), filter_label(excluded), n_resamples, confidence)
+    with _lock:
+        if key not in _bootstraps:
+            _bootstraps[key] = bootstrap_regressions(
+                layer.attributes, crime_types, layer.index.keep_mask(excluded), n_resamples, confidence
+            )
+            logger.debug(f"bootstrap of {n_resamples} resamples for '{filter_label(excluded)}' computed")
+        return _bootstraps[key][crime_type]
@@ -0,0 +1,66 @@
+"""
+Declared column types for the derived capstone_streamlit_* artifacts.
+
+The same schema is used when an artifact is converted to Parquet and when it
+has to be read from the CSV (remote fallback), so a page always gets the same
+dtypes whichever file was found. 'month' marks a 'YYYY-MM' column that is
+parsed to a datetime.
+"""
+import pandas as pd
+
+COUNT_COLUMNS = [
+    f'{source}_{crime}'
+    for crime in ['theft', 'na', 'drug', 'sexassult', 'parts', 'violent', 'property', 'person']
+    for source in ['crime', 'dispatch']
+]
+
+SCHEMAS = {
+    'linemap_agecn1': {'month_year': 'month', 'Agency': 'category', 'Crime Name1': 'category', 'count': 'int32'},
+    'linemap_agecn2': {'month_year': 'month', 'Agency': 'category', 'Crime Name1': 'category', 'count': 'int32'},
+    'linemap_agesum': {'month_year': 'month', 'match_status': 'category', 'Police_district_Number': 'category', 'count': 'int32'},
+    'linemap_catsum': {'month_year': 'month', 'match_status': 'category', 'category': 'category', 'count': 'int32'},
+    'linemap_cn1cn2': {'month_year': 'month', 'Crime Name1': 'category', 'Crime Name2': 'category', 'count': 'int32'},
+    'linemap_cn2': {'month_year': 'month', 'Crime Name2': 'category', 'count': 'int32'},
+    'linemap_victims': {'month_year': 'month', 'Agency': 'category', 'sum_victims': 'float32'},
+    'crime_ns2_dash': {'month_year': 'month', 'Crime Name1': 'category', 'Crime Name2': 'category', 'Count': 'int32'},
+    'scattermap': {
+        'tract': 'str',
+        **{col: 'int32' for col in COUNT_COLUMNS},
+        'population': 'float64',
+        'GEOID': 'int64',
+        'MTFCC': 'category',
+        'FUNCSTAT': 'category',
+    },
+}
+
+
+def csv_dtypes(schema):
+    """
+    Splits a schema into read_csv dtype arguments and the month columns parsed afterwards
+    """
+    dtypes = {col: dtype for col, dtype in schema.items() if dtype != 'month'}
+    month_columns = [col for col, dtype in schema.items() if dtype == 'month']
+    return dtypes, month_columns
+
+
+def apply_schema(df, schema):
+    """
+    Casts the columns of an already loaded frame to the declared types
+    """
+    dtypes, month_columns = csv_dtypes(schema)
+    df = df.astype({col: dtype for col, dtype in dtypes.items() if col in df.columns})
+    for col in month_columns:
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], format='%Y-%m')
+    return df
+
+
+def read_typed_csv(source, schema):
+    """
+    Reads a CSV with the declared types applied while parsing
+    """
+    dtypes, month_columns = csv_dtypes(schema)
+    df = pd.read_csv(source, dtype=dtypes)
+    for col in month_columns:
+        df[col] = pd.to_datetime(df[col], format='%Y-%m')
+    return df
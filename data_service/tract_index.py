@@ -0,0 +1,72 @@
+"""
+Named tract groups and their exclusion masks.
+
+The groups (Takoma Park PD tracts, tracts with a police station, ...) are
+defined in config/tract_groups.json. A TractIndex is built once per geometry
+layer: one boolean mask per group over the layer's row order, and the "keep"
+mask of every combination of excluded groups is computed on first use and
+kept. Masks are read-only arrays shared between sessions.
+"""
+import logging
+
+import numpy as np
+
+from data_service.registry import load_config
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = 'tract_groups.json'
+
+
+def load_tract_groups(file_name=CONFIG_FILE):
+    """
+    Returns the tract group config, see config/tract_groups.json
+    """
+    return load_config(file_name)
+
+
+class TractIndex:
+    """
+    Precomputed group membership masks over a fixed sequence of tracts
+    """
+
+    def __init__(self, tracts, groups):
+        self.tracts = np.asarray(tracts).astype(str)
+        self.groups = groups
+        self.masks = {}
+        for name, group in groups.items():
+            mask = np.isin(self.tracts, group['tracts'])
+            missing = set(group['tracts']) - set(self.tracts[mask])
+            if missing:
+                logger.warning(f"tract group '{name}': {sorted(missing)} not in the layer")
+            mask.flags.writeable = False
+            self.masks[name] = mask
+        self._keep = {}
+
+    @classmethod
+    def from_config(cls, tracts, file_name=CONFIG_FILE):
+        return cls(tracts, load_tract_groups(file_name)['groups'])
+
+    def labels(self):
+        """
+        {group: label} in config order, for building the filter widgets
+        """
+        return {name: group.get('label', name) for name, group in self.groups.items()}
+
+    def keep_mask(self, excluded=()):
+        """
+        True for the tracts in none of the excluded groups
+        """
+        key = frozenset(excluded)
+        mask = self._keep.get(key)
+        if mask is None:
+            unknown = key - set(self.masks)
+            if unknown:
+                raise KeyError(f'Unknown tract groups {sorted(unknown)}')
+            mask = np.ones(len(self.tracts), dtype=bool)
+            for name in key:
+                mask &= ~self.masks[name]
+            mask.flags.writeable = False
+            # Concurrent first calls compute the same mask, the last write wins
+            self._keep[key] = mask
+        return mask
@@ -0,0 +1,101 @@
+"""
+Precomputed treemap figures for the treemap page.
+
+The page only offers four subgroups, yet it used to reload the joined dataset,
+regroup it and rebuild the plotly figure on every selectbox change. Here the
+hierarchy and the serialized figure JSON of every subgroup are built together
+the first time any of them is asked for, and kept per data version (see
+registry.dataset_version). data_service/warmup.py builds them when the server
+runs its first session, so by the time somebody opens the page switching
+subgroup is a dictionary lookup.
+
+When the file changes on disk the version changes with it, the registry parses
+the new file and the figures are rebuilt on the next request.
+"""
+import logging
+import threading
+
+from data_service.hierarchy import build_hierarchy
+from data_service.registry import dataset_version, load_dataset
+
+logger = logging.getLogger(__name__)
+
+DATASET = 'treemap'
+ROOT = 'Montgomery County'
+MATCH_STATUS = {1: 'Dispatch', 2: 'Crime', 3: 'Match'}
+SELECTIONS = ['category', 'Police_district_Number', 'Priority', 'Agency']
+
+_figures = {}
+_lock = threading.Lock()
+
+
+def prepare(df_treemap):
+    """
+    match_status codes replaced by their labels, on a new frame (the loaded one is shared)
+    """
+    return df_treemap.assign(match_status=df_treemap['match_status'].map(MATCH_STATUS))
+
+
+def treemap_figure(df_treemap, selection):
+    """
+    Treemap of the match status and the selected subgroup
+    """
+    # plotly.io costs half a second, capstone.py imports this module before any figure is needed
+    import plotly.graph_objects as go
+
+    nodes = build_hierarchy(df_treemap, ['match_status', selection], root=ROOT)
+    figure = go.Figure(go.Treemap(
+        ids=nodes['ids'],
+        labels=nodes['labels'],
+        parents=nodes['parents'],
+        values=nodes['values'],
+        textinfo="label+value",
+        branchvalues="total"
+    ))
+    figure.update_layout(
+        title='Treemap of the number of Dispatches and Crime Reports with Matching ID`s by ',
+        width=900,
+        height=700,
+        treemapcolorway=["#636efa", "#EF553B", "#00cc96"],  # fix colour palette
+        margin=dict(t=50, l=25, r=25, b=25)
+    )
+    return figure
+
+
+def build_figures(df_treemap, selections=SELECTIONS):
+    """
+    {selection: figure JSON} for every subgroup
+    """
+    import plotly.io as pio
+
+    return {selection: pio.to_json(treemap_figure(df_treemap, selection), validate=False) for selection in selections}
+
+
+def treemap_figures(name=DATASET):
+    """
+    The figure JSON of every subgroup for the current version of the dataset
+    """
+    version = dataset_version(name)
+    key = (name, version)
+    figures = _figures.get(key)
+    if figures is not None:
+        return figures
+
+    with _lock:
+        if key in _figures:
+            return _figures[key]
+        try:
+            figures = build_figures(prepare(load_dataset(name)))
+        except Exception as e:
+            logger.error(f"error building the treemap figures of '{name}': {str(e)}")
+            raise
+        for cached in [cached for cached in _figures if cached[0] == name]:
+            # Figures of an older version of the file
+            _figures.pop(cached)
+        _figures[key] = figures
+        logger.debug(f"treemap figures of '{name}' built ({version})")
+        return figures
+
+
+def treemap_json(selection, name=DATASET):
+    return treemap_figures(name)[selection]
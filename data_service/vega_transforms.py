@@ -0,0 +1,88 @@
+"""
+Server-side evaluation of the Vega-Lite transforms used by the timeseries chart.
+
+In the default (browser) mode the whole aggregated frame is embedded in the spec
+and the browser runs the timeUnit, aggregate and brush filter transforms. In
+server mode the same steps run here:
+
+- the overview (time selector) gets the monthly counts already aggregated in
+  pandas, one row per month with a column per series; the browser only folds
+  them back into series, each count is sent once without its month and series
+  name repeated
+- the brush comes back through Streamlit's selection state and the detail chart
+  is built from only the rows inside it; with nothing brushed only the
+  overview is sent
+- columns the encodings do not use are dropped before serialising
+
+VegaFusion does the same thing generically; this covers the handful of
+transforms the page uses without the extra dependency.
+"""
+import json
+import logging
+import re
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def spec_payload_bytes(*charts):
+    """
+    Size in bytes of the JSON specs (data included) sent to the browser
+    """
+    return sum(len(json.dumps(chart.to_dict(), default=str)) for chart in charts)
+
+
+def prune_columns(df, columns):
+    """
+    Keeps only the columns the chart encodes
+    """
+    return df[[col for col in columns if col in df.columns]]
+
+
+def wide_series(df, series_col, time_col='month_year', value_col='count'):
+    """
+    One row per time value and one column per series, for transform_fold(series_fields(...))
+    """
+    wide = df.pivot_table(index=time_col, columns=series_col, values=value_col, aggfunc='sum', fill_value=0,
+                          observed=True)
+    wide.columns = wide.columns.astype(str)
+    return wide.reset_index()
+
+
+def series_fields(wide, time_col='month_year'):
+    """
+    The series columns of a wide_series frame as Vega field names, '.' and brackets escaped
+    so they are not read as nested paths
+    """
+    return [re.sub(r'([.\[\]\\])', r'\\\1', col) for col in wide.columns if col != time_col]
+
+
+def brush_bounds(selection_state, param, field='month_year'):
+    """
+    (start, end) Timestamps of an interval selection, or None when nothing is brushed.
+
+    selection_state is what st.altair_chart(..., on_select='rerun') returns;
+    temporal bounds arrive as epoch milliseconds.
+    """
+    try:
+        selection = (selection_state or {}).get('selection', {}).get(param) or {}
+        bounds = selection.get(field)
+        if not bounds or len(bounds) != 2:
+            return None
+        start, end = (pd.to_datetime(value, unit='ms') if isinstance(value, (int, float)) else pd.to_datetime(value)
+                      for value in bounds)
+        return min(start, end), max(start, end)
+    except Exception as e:
+        logger.error(f'error reading brush selection: {str(e)}')
+        return None
+
+
+def filter_bounds(df, bounds, time_col='month_year'):
+    """
+    Rows inside the brush, the server-side version of transform_filter(brush)
+    """
+    if bounds is None:
+        return df
+    start, end = bounds
+    return df[df[time_col].between(start, end)]
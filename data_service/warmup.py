@@ -0,0 +1,188 @@
+"""
+Background warm-up of every option the dashboards offer.
+
+The option sets are small and closed: four LINEGRAPH keys on the timeseries
+page, seven CRIME_TYPES on the geographic page, four treemap subgroups and the
+eight datasets_list entries of the data breakdown. start_warmup() runs once
+per process on a daemon thread and, for each option, does what the page does
+on its first run with the default widgets:
+
+    timeseries          load the extracts (or cube), aggregate with every value selected, build the chart
+    geographic          load the tract layer, fit the regressions and bootstrap, build the chart
+    treemap             build the figure JSON (data_service/treemap_cache.py)
+    data_breakdown      load the dataset, import matplotlib for the Venn diagram
+
+The results land in the caches the pages already read (registry, geo_cache,
+regression, aggregation_cache, treemap_cache), so a user picking an option
+afterwards gets a cache hit. Charts are kept in chart_cache with the key the
+page asks for; compiling each spec once also warms altair's schema validator.
+
+Page files are imported as modules (without running main()) so the warm-up
+uses their own functions and option lists. This module only imports the
+standard library at load time, so capstone.py can show status() before pandas
+has been imported.
+"""
+import importlib.util
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_pages = {}
+# One lock per page file, so importing a page does not hold up start_warmup() or other pages
+_page_locks = {}
+_lock = threading.Lock()
+_status = None
+_thread = None
+
+
+class WarmupStatus:
+    """
+    Progress of the warm-up, shared with every session of the landing page
+    """
+
+    def __init__(self):
+        self.total = None
+        self.done = 0
+        self.failed = []
+        # Set when the tasks could not even be listed, nothing was precomputed then
+        self.error = None
+        self.current = None
+        self.started = time.time()
+        self.finished = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.finished is not None
+
+    def begin(self, total):
+        with self._lock:
+            self.total = total
+
+    def step(self, name, failed=False):
+        with self._lock:
+            self.done += 1
+            if failed:
+                self.failed.append(name)
+
+    def finish(self, error=None):
+        with self._lock:
+            self.current = None
+            self.error = error
+            self.finished = time.time()
+
+    def seconds(self):
+        return (self.finished or time.time()) - self.started
+
+
+def page_module(name):
+    """
+    pages/<name>.py imported as a module, its main() is not run
+    """
+    with _lock:
+        page_lock = _page_locks.setdefault(name, threading.Lock())
+    with page_lock:
+        if name not in _pages:
+            from data_service.registry import REPO_ROOT
+
+            spec = importlib.util.spec_from_file_location(f'pages.{name}', REPO_ROOT / 'pages' / f'{name}.py')
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            _pages[name] = module
+        return _pages[name]
+
+
+def warm_timeseries(key):
+    ts = page_module('timeseries')
+    frames = dict(zip(ts.LINEGRAPH_LABELS, ts.data_loader()))
+    dataset = frames[key]
+    # Every checkbox starts ticked, the same cache key the page asks for
+    chart = ts.linegraph_chart(key, dataset, list(dataset[ts.LINEGRAPH_LABELS[key][0]].unique()))
+    # Compiling the spec once warms altair's schema validator
+    chart.to_dict()
+
+
+def warm_geographic(crime):
+    geo = page_module('geographic_distribution')
+    geo.linked_chart(crime).to_dict()
+    # Bootstrap of every crime type with no tracts excluded, for when the bands are switched on
+    geo.get_bootstrap(crime)
+
+
+def warm_treemap(selection):
+    from data_service.treemap_cache import treemap_json
+    treemap_json(selection)
+
+
+def warm_breakdown(dataset):
+    from data_service.bundles import BUNDLES
+    from data_service.registry import load_dataset
+    load_dataset(BUNDLES['breakdown'][dataset])
+
+
+def warm_venn():
+    # Only imported: the page draws the diagram once per process itself
+    import matplotlib.pyplot
+    import matplotlib_venn
+
+
+def warmup_tasks():
+    """
+    (name, function, args) for every option of every page
+    """
+    from data_service.treemap_cache import SELECTIONS
+
+    tasks = [(f'treemap/{selection}', warm_treemap, (selection,)) for selection in SELECTIONS]
+    tasks += [(f'timeseries/{key}', warm_timeseries, (key,)) for key in page_module('timeseries').LINEGRAPH_LABELS]
+    tasks += [(f'geographic/{crime}', warm_geographic, (crime,)) for crime in page_module('geographic_distribution').CRIME_TYPES]
+    tasks += [(f'data_breakdown/{dataset}', warm_breakdown, (dataset,)) for dataset in page_module('data_breakdown').datasets_list]
+    tasks.append(('data_breakdown/venn', warm_venn, ()))
+    return tasks
+
+
+def run_warmup(status):
+    """
+    Runs every task in turn, a failing task is logged and the rest still run
+    """
+    try:
+        tasks = warmup_tasks()
+    except Exception as e:
+        logger.error(f'error listing the warm-up tasks: {str(e)}')
+        status.finish(error=str(e))
+        return
+    status.begin(len(tasks))
+    for name, function, args in tasks:
+        status.current = name
+        start = time.perf_counter()
+        try:
+            function(*args)
+        except Exception as e:
+            logger.warning(f'warm-up of {name} failed, the page will compute it: {str(e)}')
+            status.step(name, failed=True)
+            continue
+        status.step(name)
+        logger.debug(f'warmed {name} in {time.perf_counter() - start:.2f}s')
+    status.finish()
+    logger.info(f'warm-up done: {status.done - len(status.failed)} of {status.total} in {status.seconds():.1f}s')
+
+
+def start_warmup():
+    """
+    Starts the warm-up thread once per process and returns its status
+    """
+    global _status, _thread
+    with _lock:
+        if _thread is None:
+            _status = WarmupStatus()
+            _thread = threading.Thread(target=run_warmup, args=(_status,), name='warmup', daemon=True)
+            _thread.start()
+        return _status
+
+
+def status():
+    """
+    The WarmupStatus of this process, None before start_warmup()
+    """
+    return _status
@@ -1,8 +1,6 @@
+import io
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib_venn import venn3, venn3_circles
-import numpy as np
+from data_service import LOAD_WORKERS, load_bundle, load_member
 
 # List definitions
 transformed_list = [ 
@@ -55,17 +53,14 @@ treemap_list = ['Agency', 'Priority', 'match_status', 'Police_district_Number',
 datasets_list = ['dispatch', 'crime', 'joined', 'treemap', 'choropleth1','choropleth2','line', 'census']
 
 
-def data_loader():
-    # Load the data
-    treemap = pd.read_csv('/Users/gimle/DATA-205/capstone_streamlit_treemap_short.csv')
-    joined = pd.read_csv('/Users/gimle/DATA-205/capstone_streamlit_joined_short.csv')
-    choropleth1 = pd.read_csv('/Users/gimle/DATA-205/capstone_streamlit_choropleth1_short.csv')
-    choropleth2 = pd.read_csv('/Users/gimle/DATA-205/capstone_streamlit_choropleth2_short.csv')
-    census  = pd.read_csv('/Users/gimle/DATA-205/capstone_streamlit_census_short.csv')
-    dispatch = pd.read_csv('/Users/gimle/DATA-205/capstone_streamlit_dispatch_short.csv')
-    crime = pd.read_csv('/Users/gimle/DATA-205/capstone_streamlit_crime_short.csv')
-    line = pd.read_csv('/Users/gimle/DATA-205/capstone_streamlit_linemap_short.csv')
-    return dispatch, crime, census, joined, treemap, choropleth1, choropleth2, line 
+def data_loader(selected_dataset):
+    # Only the dataset on screen is read, shared with every other page and session (see data_service/bundles.py)
+    return load_member('breakdown', selected_dataset)
+
+
+def load_all():
+    # Every dataset at once, the files are read side by side on a thread pool
+    return load_bundle('breakdown', workers=LOAD_WORKERS)._asdict()
     
 
 def color_columns(df, transformed_list, merged_list, join_list, census_list, dispatch_list, crime_list):
@@ -97,6 +92,10 @@ def color_columns(df, transformed_list, merged_list, join_list, census_list, dis
 
 
 def create_venn_diagram():
+    # matplotlib and matplotlib_venn take about a second to import and only this diagram needs them
+    import matplotlib.pyplot as plt
+    from matplotlib_venn import venn3
+
     # Create a figure
     fig, ax = plt.subplots(figsize=(10, 6))
     
@@ -161,6 +160,18 @@ def create_venn_diagram():
     return fig
 
 
+@st.cache_resource(show_spinner=False)
+def venn_diagram_png():
+    # The diagram never changes, so it is drawn once per process (same settings as st.pyplot)
+    import matplotlib.pyplot as plt
+
+    fig = create_venn_diagram()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=200, bbox_inches='tight')
+    plt.close(fig)
+    return buffer.getvalue()
+
+
 def explainer(selected_dataset): 
     speech_dictionary = {
         'dispatch':
@@ -347,38 +358,42 @@ def main():
     - :gray[**Gray**]: Is the colour of the join column 
     """
     )
-    dispatch, crime, census, joined, treemap, choropleth1, choropleth2, line = data_loader()
-    dataset_mapping = {
-        'dispatch': dispatch,
-        'crime': crime,
-        'census': census,
-        'joined': joined,
-        'treemap': treemap,
-        'choropleth1': choropleth1,
-        'choropleth2': choropleth2,
-        'line': line
-    }
-
     st.sidebar.header("Select a dataset to explore")
     selected_dataset = st.sidebar.selectbox(
         "Select a subgroup to explore",
         options=datasets_list
     )
-
-    current_df = dataset_mapping[selected_dataset]
-    styled_df = color_columns(
-        current_df, 
-        transformed_list, 
-        merged_list, 
-        join_list, 
-        census_list, 
-        dispatch_list, 
-        crime_list
+    show_all = st.sidebar.checkbox(
+        "Show all datasets",
+        value=False,
+        help="Loads all eight datasets together and shows each in its own tab"
     )
-    st.pyplot(create_venn_diagram())
-    st.dataframe(styled_df)
-    
-    st.markdown(explainer(selected_dataset))
+
+    # Drawn last so the table does not wait for matplotlib, the slot keeps it on top
+    venn_slot = st.empty()
+
+    if show_all:
+        dataset_mapping = load_all()
+        for tab, name in zip(st.tabs(datasets_list), datasets_list):
+            with tab:
+                st.dataframe(color_columns(dataset_mapping[name], transformed_list, merged_list, join_list,
+                                           census_list, dispatch_list, crime_list))
+                st.markdown(explainer(name))
+    else:
+        current_df = data_loader(selected_dataset)
+        styled_df = color_columns(
+            current_df, 
+            transformed_list, 
+            merged_list, 
+            join_list, 
+            census_list, 
+            dispatch_list, 
+            crime_list
+        )
+        st.dataframe(styled_df)
+        
+        st.markdown(explainer(selected_dataset))
+    venn_slot.image(venn_diagram_png(), use_container_width=True)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,59 +1,79 @@
-from pathlib import Path
 import streamlit as st
 import pandas as pd
-import geopandas as gpd
 import altair as alt
-import altair_tiles as til
 import numpy as np
 import logging
-from sklearn.metrics import r2_score
-from sklearn.linear_model import LinearRegression
+from data_service.aggregation_cache import chart_cache
+from data_service.geo_cache import FULL_LEVEL, GEOMETRY_LEVELS, content_hash, level_dataset, load_geometry, pick_level, topo_feature
+from data_service.regression import CONFIDENCE, bootstrap_intervals, regression_table
+from data_service.prefetch import adjacent_options, session_prefetcher
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG)
 
-def tppd_remove(gdf):
-    """
-    Removes Takoma Park PD districts from the dataset
-    """
-    # Create a copy to avoid modifying the original DataFrame
-    filtered_gdf = gdf.copy()
-    # Takoma Park PD district IDs
-    takoma_districts = ['701900', '701702', '701800', '701701', '701704', '701703', '702000', '702401']
-    filtered_gdf = filtered_gdf[~filtered_gdf['tract'].isin(takoma_districts)]
-    return filtered_gdf
+# Rendered map size, also what picks the geometry detail level in 'auto'
+MAP_WIDTH = 400
+MAP_HEIGHT = 400
+MAP_DETAIL_OPTIONS = ['auto', *GEOMETRY_LEVELS, FULL_LEVEL]
 
-def police_remove(gdf):
-    """
-    Removes Police districts from the dataset
-    """
-    # Create a copy to avoid modifying the original DataFrame
-    filtered_gdf = gdf.copy()
-    # Districts supervised by Police
-    police_districts = ['701503', '704806', '703207', '700826', '700706', '700309']
-    filtered_gdf = filtered_gdf[~filtered_gdf['tract'].isin(police_districts)]
-    return filtered_gdf
+CRIME_TYPES = {
+    'theft': 'Theft Reports',
+    'drug': 'Drug-Related Incidents',
+    'sexassult': 'Sexual Assault Reports',
+    'parts': 'Auto Parts Theft',
+    'violent': 'Violent Crime',
+    'property': 'Property Crime',
+    'person': 'Crimes Against Persons'
+}
 
-def load_and_prepare_data(selected_crime):
+def load_and_prepare_data(selected_crime, map_detail='auto', excluded_groups=()):
     try:
-        file_path = 'https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/capstone_streamlit_scattermap_topo.json'
-        
-        gdf = gpd.read_file(file_path, driver='TopoJSON')
-        geo = alt.topo_feature(file_path, feature='data')
+        # Parsed once per process, switching crime type only picks other attribute columns
+        layer = load_geometry('scattermap_topo')
+        # Simplified tract outlines are enough for a 400px map, see pipeline/simplify.py
+        if map_detail == 'auto':
+            map_detail = pick_level(MAP_WIDTH, MAP_HEIGHT, layer.bbox)
+        logger.debug(f'map detail level: {map_detail}')
+        # The browser fetches the topojson for the map itself, only its URL goes in the spec (no parse here)
+        geo = topo_feature(level_dataset('scattermap_topo', map_detail), feature='data')
         
-        if selected_crime not in gdf.columns:
+        if selected_crime not in layer.attributes.columns:
             logger.error(f"Column '{selected_crime}' not found in data")
             raise ValueError(f"Crime type '{selected_crime}' not found in dataset")
         
         crime_col = f'crime_{selected_crime}'
         dispatch_col = f'dispatch_{selected_crime}'
+        # Tract group exclusions use the masks precomputed when the layer loaded
+        gdf = layer.columns([crime_col, dispatch_col, selected_crime, 'population'], exclude=excluded_groups)
         
         return gdf, crime_col, dispatch_col, geo
     
     except Exception as e:
         logger.error(f"Error in data preparation: {str(e)}")
         raise
-def create_linked_visualization(gdf, selected_crime, crime_col, dispatch_col, geo):
+
+def get_regression(selected_crime, excluded_groups=()):
+    """
+    Slope, intercept and R² of crime reports on dispatches for the shown tracts,
+    all crime types and filter combinations are fitted together once per process
+    """
+    try:
+        return regression_table(load_geometry('scattermap_topo'), list(CRIME_TYPES)).get(selected_crime, excluded_groups)
+    except Exception as e:
+        logger.error(f"Error in regression: {str(e)}")
+        raise
+
+def get_bootstrap(selected_crime, excluded_groups=()):
+    """
+    Bootstrap confidence interval of the slope and band of the regression line, cached per filter set
+    """
+    try:
+        return bootstrap_intervals(load_geometry('scattermap_topo'), list(CRIME_TYPES), selected_crime, excluded_groups)
+    except Exception as e:
+        logger.error(f"Error in bootstrap: {str(e)}")
+        raise
+
+def create_linked_visualization(gdf, selected_crime, crime_col, dispatch_col, geo, fit, bootstrap=None):
     try:
         brush = alt.selection_interval(
             encodings=['x', 'y'],
@@ -101,19 +121,15 @@ def create_linked_visualization(gdf, selected_crime, crime_col, dispatch_col, ge
             title=f"Crime Reports vs Dispatches: {selected_crime.title()}"
         ).add_selection(brush)
         
-        # Regression analysis
-        X = gdf[[dispatch_col]]
-        y = gdf[crime_col]
-        lr = LinearRegression()
-        lr.fit(X, y)
-        r2 = r2_score(y, lr.predict(X))
-        slope = lr.coef_[0]  # Get the slope coefficient
-        intercept = lr.intercept_  # Get the intercept
+        # Regression analysis, precomputed in data_service/regression.py
+        r2 = fit['r2']
+        slope = fit['slope']  # Get the slope coefficient
+        intercept = fit['intercept']  # Get the intercept
         
         # Create regression line
-        x_range = np.linspace(X.min(), X.max(), 100).reshape(-1, 1)
-        y_pred = lr.predict(x_range)
-        regression_df = pd.DataFrame({'x': x_range.flatten(), 'y': y_pred})
+        x_range = np.linspace(gdf[dispatch_col].min(), gdf[dispatch_col].max(), 100)
+        y_pred = intercept + slope * x_range
+        regression_df = pd.DataFrame({'x': x_range, 'y': y_pred})
         
         regression = alt.Chart(regression_df).mark_line(
             color='red',
@@ -140,11 +156,14 @@ def create_linked_visualization(gdf, selected_crime, crime_col, dispatch_col, ge
             text='text:N'
         )
         
-        # Slope annotation
+        # Slope annotation, with its confidence interval when the bootstrap is shown
+        slope_text = f'm = {slope:.3f}'
+        if bootstrap is not None:
+            slope_text += f" [{bootstrap['slope_ci'][0]:.3f}, {bootstrap['slope_ci'][1]:.3f}]"
         slope_annotation = alt.Chart(pd.DataFrame([{
             'x': gdf[dispatch_col].min(),
             'y': gdf[crime_col].max(),
-            'text': f'm = {slope:.3f}'
+            'text': slope_text
         }])).mark_text(
             color='black',
             fontSize=16,
@@ -170,7 +189,7 @@ def create_linked_visualization(gdf, selected_crime, crime_col, dispatch_col, ge
             from_=lookup_data
         ).encode(
             opacity=alt.condition(brush, alt.value(1), alt.value(0.2)),
-            color=alt.Color(f'properties.{selected_crime}:Q', 
+            color=alt.Color(f'{selected_crime}:Q', 
                 scale=alt.Scale(
                     domain=[-1, 0, 1],
                     range=['rgb(255,0,0)', 'rgb(255,255,255)', 'rgb(0,0,255)']
@@ -178,17 +197,29 @@ def create_linked_visualization(gdf, selected_crime, crime_col, dispatch_col, ge
                 title="Crime vs Dispatch ratio"),
             tooltip=[
                 alt.Tooltip('properties.tract:N', title='Census Tract'),
-                alt.Tooltip(f'properties.{crime_col}:Q', title='Crime Reports', format=','),
-                alt.Tooltip(f'properties.{dispatch_col}:Q', title='Dispatches', format=','),
-                alt.Tooltip(f'properties.{selected_crime}:Q', title='Normalized Ratio', format='.2f')
+                alt.Tooltip(f'{crime_col}:Q', title='Crime Reports', format=','),
+                alt.Tooltip(f'{dispatch_col}:Q', title='Dispatches', format=','),
+                alt.Tooltip(f'{selected_crime}:Q', title='Normalized Ratio', format='.2f')
             ]
         ).properties(
-            width=400,
-            height=400,
+            width=MAP_WIDTH,
+            height=MAP_HEIGHT,
             title="Geographic Distribution"
         )
 
-        top_chart = alt.layer(scatter, regression, r_2_annotation, slope_annotation)
+        top_layers = [scatter, regression, r_2_annotation, slope_annotation]
+        if bootstrap is not None:
+            # Confidence band of the regression line, drawn under the points
+            band = alt.Chart(bootstrap['band']).mark_area(
+                color='red',
+                opacity=0.15
+            ).encode(
+                x='x',
+                y='low',
+                y2='high'
+            )
+            top_layers.insert(0, band)
+        top_chart = alt.layer(*top_layers)
         bottom_chart = map_chart
         final_viz = alt.vconcat(
             bottom_chart,
@@ -206,6 +237,36 @@ def create_linked_visualization(gdf, selected_crime, crime_col, dispatch_col, ge
         logger.error(f"Error creating visualization: {str(e)}")
         raise
 
+def linked_chart_key(selected_crime, map_detail='auto', excluded_groups=(), show_bootstrap=False):
+    # The content hashes of the tract layer and of the outlines the map points at, so a changed file is not served stale
+    layer = load_geometry('scattermap_topo')
+    level = pick_level(MAP_WIDTH, MAP_HEIGHT, layer.bbox) if map_detail == 'auto' else map_detail
+    outlines = content_hash(level_dataset('scattermap_topo', level))
+    return ('geographic', layer.content_hash, outlines, selected_crime, map_detail, frozenset(excluded_groups), show_bootstrap)
+
+def linked_chart(selected_crime, map_detail='auto', excluded_groups=(), show_bootstrap=False):
+    """
+    The map and scatter plot of a crime type, cached per widget values so revisited,
+    warmed and prefetched crime types are reused
+    """
+    def build():
+        gdf, crime_col, dispatch_col, geo = load_and_prepare_data(selected_crime, map_detail, excluded_groups)
+        fit = get_regression(selected_crime, excluded_groups)
+        bootstrap = get_bootstrap(selected_crime, excluded_groups) if show_bootstrap else None
+        return create_linked_visualization(gdf, selected_crime, crime_col, dispatch_col, geo, fit, bootstrap)
+
+    return chart_cache.get_or_compute(linked_chart_key(selected_crime, map_detail, excluded_groups, show_bootstrap), build)
+
+def prefetch_adjacent(selected_crime, map_detail='auto', excluded_groups=(), show_bootstrap=False):
+    """
+    Builds the charts of the neighbouring crime types in the background, with the same filters
+    """
+    session_prefetcher().prefetch({
+        linked_chart_key(crime, map_detail, excluded_groups, show_bootstrap):
+            lambda crime=crime: linked_chart(crime, map_detail, excluded_groups, show_bootstrap)
+        for crime in adjacent_options(CRIME_TYPES, selected_crime)
+    })
+
 def main():
     try:
         st.set_page_config(
@@ -216,16 +277,6 @@ def main():
         
         st.title("Geographic Comparison of Crime vs Dispatch Data")
         
-        CRIME_TYPES = {
-            'theft': 'Theft Reports',
-            'drug': 'Drug-Related Incidents',
-            'sexassult': 'Sexual Assault Reports',
-            'parts': 'Auto Parts Theft',
-            'violent': 'Violent Crime',
-            'property': 'Property Crime',
-            'person': 'Crimes Against Persons'
-        }
-        
         # Improved sidebar with descriptions
         st.sidebar.header("Data Selection")
         selected_crime = st.sidebar.selectbox(
@@ -234,22 +285,28 @@ def main():
             format_func=lambda x: CRIME_TYPES[x]
         )
         
-        # Load initial data
-        gdf, crime_col, dispatch_col, geo = load_and_prepare_data(selected_crime)
-        
+        map_detail = st.sidebar.selectbox(
+            "Map detail",
+            options=MAP_DETAIL_OPTIONS,
+            help="'auto' picks the lightest tract outlines that still look right at the map's size"
+        )
+
         # Add filter options
         st.sidebar.header("Filter Options")
         
-        # Filter for Takoma Park PD districts
-        remove_takoma = st.sidebar.checkbox("Remove districts supervised by Takoma Park PD", value=False)
-        if remove_takoma:
-            gdf = tppd_remove(gdf)
-            
-        # Filter for Police districts
-        remove_police = st.sidebar.checkbox("Remove tracts with Police Stations", value=False)
-        if remove_police:
-            gdf = police_remove(gdf)
-        
+        # One checkbox per tract group in config/tract_groups.json (Takoma Park PD, police stations, ...),
+        # the same groups the layer's exclusion masks were built from
+        excluded_groups = [
+            name for name, label in load_geometry('scattermap_topo').index.labels().items()
+            if st.sidebar.checkbox(label, value=False, key=f'exclude_{name}')
+        ]
+
+        show_bootstrap = st.sidebar.checkbox(
+            f"Show {CONFIDENCE:.0%} bootstrap confidence bands",
+            value=False,
+            help="Resamples the tracts to show how certain the regression line and slope are"
+        )
+
         st.sidebar.markdown("""
         ### About this Visualization
         This tool compares crime reports with police dispatches across census tracts.
@@ -272,9 +329,12 @@ def main():
         """)
         
         # Create visualization with filtered data
-        viz = create_linked_visualization(gdf, selected_crime, crime_col, dispatch_col, geo)
+        viz = linked_chart(selected_crime, map_detail, excluded_groups, show_bootstrap)
         
         st.altair_chart(viz, use_container_width=True)
+
+        # The next crime type is likely a neighbour in the list, build those while this one is read
+        prefetch_adjacent(selected_crime, map_detail, excluded_groups, show_bootstrap)
         
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")
@@ -1,104 +1,196 @@
-from pathlib import Path
 import streamlit as st
 import pandas as pd
-import numpy as np
 import logging
 import altair as alt
+from data_service import IncidentCube, bundle_datasets, dataset_version, load_bundle, load_cube, local_path
+from data_service.aggregation_cache import chart_cache, linemap_cache
+from data_service.downsampling import OTHER_LABEL, reduce_for_rendering
+from data_service.prefetch import adjacent_options, session_prefetcher
+from data_service.vega_transforms import brush_bounds, filter_bounds, prune_columns, series_fields, wide_series
 
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG)
 
+# Rendering limits for this page: at most SERIES_CAP lines (the rest summed into 'Other')
+# and LTTB downsampling once a line has more than MAX_POINTS_PER_SERIES months
+SERIES_CAP = 10
+MAX_POINTS_PER_SERIES = 120
+
+# Where the brush filter and overview aggregation run, see data_service/vega_transforms.py
+TRANSFORM_MODES = ['In the browser', 'On the server']
+BRUSH_PARAM = 'brush'
+
+# Dimensions behind each LINEGRAPH option, the same slices the linemap_* extracts hold
+LINEGRAPH_DIMENSIONS = {
+    'Agency': ['Agency', 'Crime Name1'],
+    'Crime Type 1': ['Crime Name1', 'Crime Name2'],
+    'Match Status': ['match_status', 'category'],
+    'Crime Name 2': ['Crime Name2'],
+}
+
+# LINEGRAPH option -> (column the lines are split by, y axis title, legend title)
+LINEGRAPH_LABELS = {
+    'Agency': ('Agency', 'Crime Counts by Agency', 'Agency'),
+    'Crime Type 1': ('Crime Name1', 'Crime Counts by Crime Type', 'Crime Type'),
+    'Match Status': ('match_status', 'Crime Counts by Match Status', 'Match Status'),
+    'Crime Name 2': ('Crime Name2', 'Crime Counts by Crime Name 2', 'Crime Name 2'),
+}
+
+# LINEGRAPH option -> linemap extract it is read from when the cube is not built
+LINEGRAPH_DATASETS = dict(zip(LINEGRAPH_LABELS, bundle_datasets('linemap')))
+
+
+def data_version(selected_linegraph_key):
+    '''
+    Version of the file behind an option, part of the cache keys so a changed artifact is not served stale
+    '''
+    if local_path('incident_cube').exists():
+        return dataset_version('incident_cube')
+    return dataset_version(LINEGRAPH_DATASETS[selected_linegraph_key])
+
+
 def data_loader():
     try:
-#'https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/capstone_streamlit_scattermap_topo.json'
-
-        df_age_cn1 = pd.read_csv('https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/capstone_streamlit_linemap_agecn1.csv')
-        df_cn1_cn2 = pd.read_csv('https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/capstone_streamlit_linemap_cn1cn2.csv')
-        df_match_cat = pd.read_csv('https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/capstone_streamlit_linemap_catsum.csv')
-        df_cn2 = pd.read_csv("https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/capstone_streamlit_linemap_cn2.csv")
+        # One cube load replaces the four extracts when it has been built
+        cube = load_cube()
+        if cube is not None:
+            return tuple(cube.rollup(['month_year', *dims]) for dims in LINEGRAPH_DIMENSIONS.values())
 
-        return df_age_cn1, df_cn1_cn2, df_match_cat, df_cn2
+        return load_bundle('linemap')
     except Exception as e:
         logger.error(f'error in loading: {str(e)}')
         raise e
 
 
-def linemap_function(filtered_linegraph_dataset, selected_linegraph_first_value, linegraph_y_values, color_linegraph, show_annotations=False, annotation_data=None):
-    ''' Most of the code came originally from the example on Vega-ALtairs pages, which can be found here: 
-    https://altair-viz.github.io/gallery/multiline_tooltip.html#gallery-multiline-tooltip
-    https://altair-viz.github.io/gallery/multiline_tooltip_standard.html
+def aggregate_linegraph(selected_linegraph_key, selected_linegraph_dataset, selected_linegraph_first_value, selected_statuses_linegraph):
     '''
-    try:
-        linegraph_x_values = 'Year and Month'
-        linegraph_dataset = filtered_linegraph_dataset.groupby(['month_year', selected_linegraph_first_value])['count'].sum().reset_index()
-        if pd.api.types.is_period_dtype(linegraph_dataset['month_year']):
-            linegraph_dataset['month_year'] = linegraph_dataset['month_year'].dt.to_timestamp()
+    Filters to the selected values and sums the counts per month, memoized per selection
+    so toggling a checkbox back returns the frame computed the first time
+    '''
+    key = linemap_cache.make_key(
+        selected_linegraph_key, selected_linegraph_first_value, selected_statuses_linegraph,
+        version=data_version(selected_linegraph_key)
+    )
+    filters = {selected_linegraph_first_value: selected_statuses_linegraph} if selected_statuses_linegraph else None
+    linegraph_dataset = linemap_cache.get_or_compute(
+        key,
+        lambda: IncidentCube.from_frame(selected_linegraph_dataset).rollup(['month_year', selected_linegraph_first_value], filters=filters)
+    )
+    logger.debug(f'linemap cache: {linemap_cache.stats()}')
+    return linegraph_dataset
 
-        # Create a selection that chooses the nearest point & selects based on x-value
-        nearest = alt.selection_point(nearest=True, on="mouseover", 
-                                fields=["month_year"], empty=False)
-        brush = alt.selection_interval(encodings=['x'])
-        # The basic line
-        line = alt.Chart(linegraph_dataset).mark_line(interpolate="basis").encode(
-            x= alt.X('month_year:T', timeUnit='yearmonth', title= linegraph_x_values),
-            y= "count:Q",
-            color= alt.Color(f'{selected_linegraph_first_value}:N').title(color_linegraph)
-        )
 
-        # Transparent selectors across the chart. This is what tells us  x value of the cursor
-        selectors = alt.Chart(linegraph_dataset).mark_point().encode(
-            x= alt.X('month_year:T', timeUnit='yearmonth'),
-            opacity= alt.value(0),
-        ).add_selection(nearest)
+def prepare_linegraph(selected_linegraph_key, selected_linegraph_dataset, selected_statuses_linegraph, cap_series=True):
+    '''
+    Aggregated and reduced lines of a LINEGRAPH option, the data both transform modes chart
+    '''
+    selected_linegraph_first_value = LINEGRAPH_LABELS[selected_linegraph_key][0]
+    linegraph_dataset = aggregate_linegraph(
+        selected_linegraph_key,
+        selected_linegraph_dataset,
+        selected_linegraph_first_value,
+        selected_statuses_linegraph
+    )
+    return reduce_for_rendering(
+        linegraph_dataset,
+        selected_linegraph_first_value,
+        max_series=SERIES_CAP if cap_series else None,
+        max_points=MAX_POINTS_PER_SERIES
+    )
 
-        # Draw points on the line, and highlight based on selection
-        points = line.mark_point().encode(
-            opacity=alt.condition(nearest, alt.value(1), alt.value(0))
-        )
 
-        # Draw text labels near the points, and highlight based on selection
-        text = line.mark_text(align="left", dx=5, dy=-5).encode(
-            text=alt.condition(nearest,"count:Q", alt.value(" "))
-        )
+def _month_x(title=None, time_unit='yearmonth'):
+    ''' x encoding shared by the layers, the server mode data is already monthly so it skips the timeUnit '''
+    kwargs = {'timeUnit': time_unit} if time_unit else {}
+    if title:
+        kwargs['title'] = title
+    return alt.X('month_year:T', **kwargs)
 
-        # Draw a rule at the location of the selection
-        rules = alt.Chart(linegraph_dataset).mark_rule(color="gray").encode(
-            x= alt.X('month_year:T', timeUnit='yearmonth'),
-        ).transform_filter(
-            nearest
-        )
 
-        
+def linemap_layers(linegraph_dataset, axis_dataset, selected_linegraph_first_value, color_linegraph, show_annotations=False, annotation_data=None, time_unit='yearmonth'):
+    ''' The detail chart: lines, hover points, rule and labels, plus the annotations '''
+    linegraph_x_values = 'Year and Month'
+    # Create a selection that chooses the nearest point & selects based on x-value
+    nearest = alt.selection_point(nearest=True, on="mouseover", 
+                            fields=["month_year"], empty=False)
+    # The basic line
+    line = alt.Chart(linegraph_dataset).mark_line(interpolate="basis").encode(
+        x= _month_x(linegraph_x_values, time_unit),
+        y= "count:Q",
+        color= alt.Color(f'{selected_linegraph_first_value}:N').title(color_linegraph)
+    )
+
+    # Transparent selectors across the chart. This is what tells us  x value of the cursor
+    selectors = alt.Chart(axis_dataset).mark_point().encode(
+        x= _month_x(time_unit=time_unit),
+        opacity= alt.value(0),
+    ).add_selection(nearest)
+
+    # Draw points on the line, and highlight based on selection
+    points = line.mark_point().encode(
+        opacity=alt.condition(nearest, alt.value(1), alt.value(0))
+    )
+
+    # Draw text labels near the points, and highlight based on selection
+    text = line.mark_text(align="left", dx=5, dy=-5).encode(
+        text=alt.condition(nearest,"count:Q", alt.value(" "))
+    )
 
-        # Create main chart with all layers
-        main_layers = [line, selectors, points, rules, text]
+    # Draw a rule at the location of the selection
+    rules = alt.Chart(axis_dataset).mark_rule(color="gray").encode(
+        x= _month_x(time_unit=time_unit),
+    ).transform_filter(
+        nearest
+    )
+
+    
+
+    # Create main chart with all layers
+    main_layers = [line, selectors, points, rules, text]
+    
+    # Add annotation layers to main chart if enabled
+    if show_annotations and annotation_data is not None:
+        vertical_lines = alt.Chart(annotation_data).mark_rule(
+            color='blue',
+            strokeWidth=1
+        ).encode(
+            x='month_year:T'
+        )
         
-        # Add annotation layers to main chart if enabled
-        if show_annotations and annotation_data is not None:
-            vertical_lines = alt.Chart(annotation_data).mark_rule(
-                color='blue',
-                strokeWidth=1
-            ).encode(
-                x='month_year:T'
-            )
-            
-            text_labels = alt.Chart(annotation_data).mark_text(
-                align='center',
-                baseline='top',
-                fontSize=12,
-                dy= 10,
-                angle=0
-            ).encode(
-                x='month_year:T',
-                text='note:N',
-                color=alt.value('orange')
-            )
-            
-            main_layers.extend([vertical_lines, text_labels])
+        text_labels = alt.Chart(annotation_data).mark_text(
+            align='center',
+            baseline='top',
+            fontSize=12,
+            dy= 10,
+            angle=0
+        ).encode(
+            x='month_year:T',
+            text='note:N',
+            color=alt.value('orange')
+        )
         
-        main_chart_linegraph = alt.layer(*main_layers).properties(
-            width=600, height=300
+        main_layers.extend([vertical_lines, text_labels])
+    
+    return alt.layer(*main_layers).properties(
+        width=600, height=300
+    )
+
+
+def linemap_function(linegraph_dataset, selected_linegraph_first_value, linegraph_y_values, color_linegraph, show_annotations=False, annotation_data=None):
+    ''' Most of the code came originally from the example on Vega-ALtairs pages, which can be found here: 
+    https://altair-viz.github.io/gallery/multiline_tooltip.html#gallery-multiline-tooltip
+    https://altair-viz.github.io/gallery/multiline_tooltip_standard.html
+    '''
+    try:
+        linegraph_x_values = 'Year and Month'
+        if pd.api.types.is_period_dtype(linegraph_dataset['month_year']):
+            linegraph_dataset = linegraph_dataset.assign(month_year=linegraph_dataset['month_year'].dt.to_timestamp())
+
+        brush = alt.selection_interval(encodings=['x'])
+        main_chart_linegraph = linemap_layers(
+            linegraph_dataset, linegraph_dataset, selected_linegraph_first_value, color_linegraph,
+            show_annotations, annotation_data
         ).transform_filter(
             brush
         )
@@ -124,6 +216,44 @@ def linemap_function(filtered_linegraph_dataset, selected_linegraph_first_value,
         raise
 
 
+def linemap_overview(linegraph_dataset, selected_linegraph_first_value, linegraph_y_values, color_linegraph):
+    ''' Server mode time selector, coloured like the browser one; the brush is read back by streamlit '''
+    try:
+        brush = alt.selection_interval(encodings=['x'], name=BRUSH_PARAM)
+        overview_data = wide_series(linegraph_dataset, selected_linegraph_first_value)
+        return alt.Chart(overview_data).transform_fold(
+            series_fields(overview_data), as_=[selected_linegraph_first_value, 'count']
+        ).mark_area().encode(
+            x=alt.X('month_year:T', title='Year and Month'),
+            y=alt.Y('count:Q', title=linegraph_y_values),
+            color=alt.Color(f'{selected_linegraph_first_value}:N').title(color_linegraph)
+        ).properties(
+            height=60, width=600
+        ).add_params(
+            brush
+        )
+    except Exception as e:
+        logger.error('error in line overview', exc_info=True)
+        raise
+
+
+def linemap_detail(linegraph_dataset, bounds, selected_linegraph_first_value, color_linegraph, show_annotations=False, annotation_data=None):
+    ''' Server mode detail chart, built from only the rows inside the brush '''
+    try:
+        visible = filter_bounds(
+            prune_columns(linegraph_dataset, ['month_year', selected_linegraph_first_value, 'count']), bounds
+        )
+        if show_annotations and annotation_data is not None:
+            annotation_data = filter_bounds(annotation_data, bounds)
+        return linemap_layers(
+            visible, visible, selected_linegraph_first_value, color_linegraph,
+            show_annotations, annotation_data, time_unit=None
+        )
+    except Exception as e:
+        logger.error('error in line detail', exc_info=True)
+        raise
+
+
 def get_annotation_data(linegraph_y_column):
     try:
         match_annotations = pd.DataFrame([
@@ -174,6 +304,47 @@ def get_annotation_data(linegraph_y_column):
         logger.error('error in getting annotation data', exc_info=True)
         return None
 
+def linegraph_chart_key(selected_linegraph_key, selected_statuses_linegraph, cap_series=True, show_annotations=False):
+    return ('timeseries', selected_linegraph_key, data_version(selected_linegraph_key),
+            frozenset(selected_statuses_linegraph), cap_series, show_annotations)
+
+
+def linegraph_chart(selected_linegraph_key, selected_linegraph_dataset, selected_statuses_linegraph, cap_series=True, show_annotations=False):
+    '''
+    The browser mode chart of an option, cached per widget values so revisited,
+    warmed and prefetched options are reused
+    '''
+    selected_linegraph_first_value, linegraph_y_values, color_linegraph = LINEGRAPH_LABELS[selected_linegraph_key]
+
+    def build():
+        annotation_data = get_annotation_data(selected_linegraph_first_value) if show_annotations else None
+        return linemap_function(
+            prepare_linegraph(selected_linegraph_key, selected_linegraph_dataset, selected_statuses_linegraph, cap_series),
+            selected_linegraph_first_value,
+            linegraph_y_values,
+            color_linegraph,
+            show_annotations,
+            annotation_data
+        )
+
+    key = linegraph_chart_key(selected_linegraph_key, selected_statuses_linegraph, cap_series, show_annotations)
+    return chart_cache.get_or_compute(key, build)
+
+
+def prefetch_adjacent(LINEGRAPH, selected_linegraph_key, cap_series=True, show_annotations=False):
+    '''
+    Builds the charts of the neighbouring options in the background, with every value ticked as they open
+    '''
+    tasks = {}
+    for key in adjacent_options(LINEGRAPH, selected_linegraph_key):
+        dataset = LINEGRAPH[key]
+        statuses = list(dataset[LINEGRAPH_LABELS[key][0]].unique())
+        tasks[linegraph_chart_key(key, statuses, cap_series, show_annotations)] = (
+            lambda key=key, dataset=dataset, statuses=statuses: linegraph_chart(key, dataset, statuses, cap_series, show_annotations)
+        )
+    session_prefetcher().prefetch(tasks)
+
+
 def main():
     try:
         
@@ -186,12 +357,7 @@ def main():
         df_age_cn1, df_cn1_cn2, df_match_cat, df_cn2 = data_loader()
         
         # Dictionary because this got complicated 
-        LINEGRAPH = {
-            'Agency': df_age_cn1,
-            'Crime Type 1': df_cn1_cn2, 
-            'Match Status': df_match_cat,
-            'Crime Name 2': df_cn2  # Added the new dataset
-        }
+        LINEGRAPH = dict(zip(LINEGRAPH_LABELS, (df_age_cn1, df_cn1_cn2, df_match_cat, df_cn2)))
 
         # SIDEBAR
         st.sidebar.markdown("""
@@ -211,25 +377,13 @@ def main():
         selected_linegraph_dataset = LINEGRAPH[selected_linegraph_key]
         
         if 'month_year' in selected_linegraph_dataset.columns and not pd.api.types.is_datetime64_any_dtype(selected_linegraph_dataset['month_year']):
-            selected_linegraph_dataset['month_year'] = pd.to_datetime(selected_linegraph_dataset['month_year'])
+            # The loaded frames are shared between sessions, so convert on a new frame instead of in place
+            selected_linegraph_dataset = selected_linegraph_dataset.assign(
+                month_year=pd.to_datetime(selected_linegraph_dataset['month_year'])
+            )
         
 
-        if selected_linegraph_key == 'Agency':
-            selected_linegraph_first_value = 'Agency'
-            linegraph_y_values = 'Crime Counts by Agency'
-            color_linegraph = 'Agency'
-        elif selected_linegraph_key == 'Crime Type 1':
-            selected_linegraph_first_value = 'Crime Name1'
-            linegraph_y_values = 'Crime Counts by Crime Type'
-            color_linegraph = 'Crime Type'
-        elif selected_linegraph_key == 'Crime Name 2':  # Added new condition for Crime Name 2
-            selected_linegraph_first_value = 'Crime Name2'
-            linegraph_y_values = 'Crime Counts by Crime Name 2'
-            color_linegraph = 'Crime Name 2'
-        else:  # 'Match Status'
-            selected_linegraph_first_value = 'match_status'
-            linegraph_y_values = 'Crime Counts by Match Status'
-            color_linegraph = 'Match Status'
+        selected_linegraph_first_value, linegraph_y_values, color_linegraph = LINEGRAPH_LABELS[selected_linegraph_key]
 
         st.sidebar.header(f'Filter by {selected_linegraph_first_value}')
         status_options_linegraph = selected_linegraph_dataset[selected_linegraph_first_value].unique()
@@ -240,14 +394,14 @@ def main():
             if st.sidebar.checkbox(str(status), value=True, key=f"status_{status}"):
                 selected_statuses_linegraph.append(status)
 
-        if selected_statuses_linegraph:
-            filtered_linegraph_dataset = selected_linegraph_dataset[
-                selected_linegraph_dataset[selected_linegraph_first_value].isin(selected_statuses_linegraph)
-            ]
-        else:
-            filtered_linegraph_dataset = selected_linegraph_dataset
+        if not selected_statuses_linegraph:
             st.warning(f"No {selected_linegraph_first_value} values selected. Showing all data.")
 
+        cap_series = st.sidebar.checkbox(
+            f"Show the top {SERIES_CAP} only (rest as '{OTHER_LABEL}')",
+            value=True,
+            help=f"Keeps the chart readable and light when more than {SERIES_CAP} values are selected"
+        )
         show_annotations = st.sidebar.checkbox("Show annotations", value=False)
       
 
@@ -255,16 +409,56 @@ def main():
         if show_annotations:
             annotation_data = get_annotation_data(selected_linegraph_first_value)
 
-        final_chart_linegraph = linemap_function(
-            filtered_linegraph_dataset, 
-            selected_linegraph_first_value, 
-            linegraph_y_values, 
-            color_linegraph,
-            show_annotations,
-            annotation_data
+        transform_mode = st.sidebar.radio(
+            "Evaluate chart filters",
+            TRANSFORM_MODES,
+            help="On the server only the brushed months are sent to the browser"
         )
-            
-        st.altair_chart(final_chart_linegraph, use_container_width=True)
+
+        if transform_mode == 'On the server':
+            # Browser mode prepares the lines inside linegraph_chart, and only when its chart is not cached
+            linegraph_dataset = prepare_linegraph(
+                selected_linegraph_key,
+                selected_linegraph_dataset,
+                selected_statuses_linegraph,
+                cap_series
+            )
+            # The detail chart sits above the time selector but needs its brush, so fill it in afterwards
+            detail_slot = st.container()
+            selection = st.altair_chart(
+                linemap_overview(linegraph_dataset, selected_linegraph_first_value, linegraph_y_values, color_linegraph),
+                use_container_width=True,
+                key=f'time_selector_{selected_linegraph_key}',
+                on_select='rerun',
+                selection_mode=BRUSH_PARAM
+            )
+            bounds = brush_bounds(selection, BRUSH_PARAM)
+            if bounds is None:
+                # Unbrushed, the detail would repeat every row of the overview, so only the overview is sent
+                detail_slot.info("Drag across the time selector below to see those months in detail.")
+            else:
+                detail_chart = linemap_detail(
+                    linegraph_dataset,
+                    bounds,
+                    selected_linegraph_first_value,
+                    color_linegraph,
+                    show_annotations,
+                    annotation_data
+                )
+                detail_slot.altair_chart(detail_chart, use_container_width=True)
+        else:
+            final_chart_linegraph = linegraph_chart(
+                selected_linegraph_key,
+                selected_linegraph_dataset,
+                selected_statuses_linegraph,
+                cap_series,
+                show_annotations
+            )
+                
+            st.altair_chart(final_chart_linegraph, use_container_width=True)
+
+        # The next option is likely one of the neighbours, build them while this one is read
+        prefetch_adjacent(LINEGRAPH, selected_linegraph_key, cap_series, show_annotations)
 
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")
@@ -1,64 +1,15 @@
-from pathlib import Path
+import json
 import streamlit as st
-import pandas as pd
-import numpy as np
 import logging
-import plotly.graph_objects as go
+from data_service.treemap_cache import treemap_json
 
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG)
-def data_loader():
+def treemap(selection):
     try:
-        file_path = "https://raw.githubusercontent.com/AskSalomon/DATA-205/refs/heads/main/capstone_streamlit_treemap.csv"
-        df_treemap = pd.read_csv(file_path)
-        reverse_match_dict = {1 :'Dispatch', 2: 'Crime', 3:'Match'}
-        df_treemap['match_status'] = df_treemap['match_status'].map(reverse_match_dict)
-    
-        return df_treemap
-    except Exception as e:
-        logger.error(f'error in loading: {str(e)}')
-        raise e
-
-def treemap(df_treemap, selection):
-    try:
-# I need df_treemap, selection
-# Group data by match_status and my selection
-        grouped_data = df_treemap.groupby(['match_status', selection ]).size().reset_index(name='count')
-
-        labels = []
-        parents = []
-        values = []
-
-        for parent in grouped_data['match_status'].unique():
-            labels.append(parent)
-            parents.append('Montgomery County')
-            values.append(grouped_data[grouped_data['match_status'] == parent]['count'].sum())
-    
-            children = grouped_data[grouped_data['match_status'] == parent]
-            for _, row in children.iterrows():
-                labels.append(f"{row[selection]}")
-                parents.append(parent)
-                values.append(row['count'])
-
-
-        treemap = go.Figure(go.Treemap(
-            labels=labels,
-            parents=parents,
-            values=values,
-            textinfo="label+value",
-            branchvalues="total"
-        ))
-
-        treemap.update_layout(
-            title='Treemap of the number of Dispatches and Crime Reports with Matching ID`s by ',
-            width=900,
-            height=700,
-            treemapcolorway=["#636efa","#EF553B", "#00cc96"], # fix colour palette
-            margin=dict(t=50, l=25, r=25, b=25)
-        )
-
-        return treemap
+        # Built once per data version for all four subgroups, see data_service/treemap_cache.py
+        return json.loads(treemap_json(selection))
     except Exception as e: 
         logger.error('error in treemap function', exc_info=True)
         raise
@@ -99,7 +50,7 @@ def main():
         - **Police Agency**: There are 4 police agencies, MCPD, Takoma Park PD, Rockville PD, and Gaithersburg PD. Police agency 
         """)
 
-        st.plotly_chart(treemap(data_loader(), selection))
+        st.plotly_chart(treemap(selection))
 
 
     except Exception as e:
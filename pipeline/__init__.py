@@ -0,0 +1,3 @@
+"""
+Offline processing steps that build the artifacts the dashboards read.
+"""
@@ -0,0 +1,50 @@
+"""
+Converts the derived CSV artifacts to Parquet with the declared column types.
+
+Run from the repository root after regenerating any of the CSVs:
+
+    python -m pipeline.artifacts            # every artifact with a schema
+    python -m pipeline.artifacts linemap_cn2
+
+The Parquet file is written next to its CSV and the dataset registry picks it
+up automatically.
+"""
+import logging
+import sys
+
+from data_service.registry import local_path, parquet_path
+from data_service.schemas import SCHEMAS, read_typed_csv
+
+logger = logging.getLogger(__name__)
+
+
+def convert_artifact(name):
+    """
+    Reads one CSV artifact with its schema and writes the Parquet copy
+    """
+    csv_path = local_path(name)
+    if not csv_path.exists():
+        raise FileNotFoundError(f"No local CSV for '{name}' at {csv_path}")
+    df = read_typed_csv(csv_path, SCHEMAS[name])
+    out_path = parquet_path(name)
+    df.to_parquet(out_path, index=False, compression='zstd')
+    logger.info(f"wrote {out_path.name} ({len(df)} rows)")
+    return out_path
+
+
+def convert_all(names=None):
+    """
+    Converts every artifact that has a schema and a local CSV
+    """
+    written = []
+    for name in names or SCHEMAS:
+        if not local_path(name).exists():
+            logger.warning(f"skipping '{name}', CSV not checked out")
+            continue
+        written.append(convert_artifact(name))
+    return written
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    convert_all(sys.argv[1:])
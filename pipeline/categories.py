@@ -0,0 +1,110 @@
+"""
+Crime / dispatch category mapping.
+
+cap_streamlit_datacleaning_v1.ipynb derives 'category' with Series.map(crime_dict)
+on Crime Name2 and Series.map(dispatch_dict) on Close Type, then fills the crime
+result with the dispatch one. The two dictionaries now live in
+config/category_map.json. Both source columns are converted to categoricals and
+their codes are mapped through a small integer lookup array built once per
+distinct value, so the per-row work is a single numpy take.
+
+As in the notebook, a missing source value maps to the config's 'missing' label
+('no crime report' / 'no dispatch'), so a row without a crime report keeps
+'no crime report' even when it has a dispatch. Values that are present but not
+in the map come out empty, are filled from the other source and are reported.
+
+The dashboards read the already derived 'category' column from the joined
+extract; this module is what the notebook's mapping cells are meant to call
+when the extract is rebuilt.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from data_service.registry import load_config
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = 'category_map.json'
+SOURCES = ['crime', 'dispatch']
+
+
+def load_category_map(file_name=CONFIG_FILE):
+    """
+    Returns the category config, see config/category_map.json
+    """
+    return load_config(file_name)
+
+
+def category_labels(category_map):
+    """
+    Every label either source can produce, in a stable order
+    """
+    labels = set()
+    for source in SOURCES:
+        labels.update(category_map[source]['map'].values())
+        labels.add(category_map[source]['missing'])
+    return sorted(labels)
+
+
+def map_categorical(values, mapping, missing, labels):
+    """
+    Maps a column through a lookup over its categories.
+
+    Returns (codes into labels with -1 for unmapped, Series of unmapped value counts).
+    """
+    categorical = pd.Categorical(values)
+    label_position = {label: i for i, label in enumerate(labels)}
+    # One slot per category plus a final slot that code -1 (missing value) lands on
+    lookup = np.array(
+        [label_position.get(mapping.get(value), -1) for value in categorical.categories]
+        + [label_position[missing]],
+        dtype=np.int32,
+    )
+    codes = lookup[categorical.codes]
+
+    unmapped_categories = [i for i, value in enumerate(categorical.categories) if value not in mapping]
+    counts = np.bincount(categorical.codes[categorical.codes >= 0], minlength=len(categorical.categories))
+    unmapped = pd.Series(
+        counts[unmapped_categories], index=categorical.categories[unmapped_categories], name='rows'
+    )
+    return codes, unmapped[unmapped > 0].sort_values(ascending=False)
+
+
+def derive_category(df, category_map=None):
+    """
+    Builds the categorical 'category' column without copying df.
+
+    Returns (category Series, report) where report lists the unmapped source values per source.
+    """
+    if category_map is None:
+        category_map = load_category_map()
+    labels = category_labels(category_map)
+
+    codes = {}
+    reports = []
+    for source in SOURCES:
+        config = category_map[source]
+        codes[source], unmapped = map_categorical(df[config['column']], config['map'], config['missing'], labels)
+        if not unmapped.empty:
+            logger.warning(f"{len(unmapped)} {config['column']} values have no category")
+        reports.append(pd.DataFrame({
+            'source': source,
+            'column': config['column'],
+            'value': unmapped.index.astype(str),
+            'rows': unmapped.to_numpy(),
+        }))
+
+    combined = np.where(codes['crime'] >= 0, codes['crime'], codes['dispatch'])
+    category = pd.Series(pd.Categorical.from_codes(combined, categories=labels), index=df.index, name='category')
+    report = pd.concat(reports, ignore_index=True)
+    return category, report
+
+
+def assign_category(df, category_map=None):
+    """
+    Returns (copy of df with 'category', report), see derive_category
+    """
+    category, report = derive_category(df, category_map)
+    return df.assign(category=category), report
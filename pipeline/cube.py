@@ -0,0 +1,57 @@
+"""
+Builds the incident cube read by data_service/cube.py.
+
+Takes the incident-level joined data (one row per crime report / dispatch, with
+Start_Time and the cube dimensions, as produced in cap_streamlit_datacleaning_v1.ipynb)
+and counts incidents per month and dimension combination. Missing dimension
+values are kept as their own empty code so no incident is lost; rollups skip
+them the same way a pandas groupby does.
+
+    python -m pipeline.cube incidents.parquet
+
+The incident-level data is not in the repository, so the cube is built offline
+and capstone_streamlit_incident_cube.parquet committed next to the other
+artifacts. Until it is, load_cube() returns None and the timeseries page reads
+the linemap extracts.
+"""
+import logging
+import sys
+
+import pandas as pd
+
+from data_service.cube import CUBE_DIMENSIONS, MEASURE
+from data_service.registry import local_path
+
+logger = logging.getLogger(__name__)
+
+
+def build_cube(incidents):
+    """
+    Month x dimension incident counts with categorical dimensions
+    """
+    month_year = incidents['Start_Time'].dt.to_period('M').dt.to_timestamp()
+    dims = incidents[CUBE_DIMENSIONS[1:]].astype('category').assign(month_year=month_year)
+    cube = (
+        dims.groupby(CUBE_DIMENSIONS, observed=True, dropna=False)
+        .size()
+        .rename(MEASURE)
+        .reset_index()
+    )
+    cube[MEASURE] = cube[MEASURE].astype('int32')
+    logger.info(f'cube: {len(incidents)} incidents in {len(cube)} cells')
+    return cube
+
+
+def write_cube(cube, path=None):
+    """
+    Writes the cube where the registry expects it
+    """
+    path = path or local_path('incident_cube')
+    cube.to_parquet(path, index=False, compression='zstd')
+    return path
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    incidents = pd.read_parquet(sys.argv[1])
+    write_cube(build_cube(incidents))
@@ -0,0 +1,149 @@
+"""
+Spatiotemporal matching of the crime reports and dispatches the ID joins left unmatched.
+
+A 'Crime' row and a 'Dispatch' row are paired when they are within radius_m
+metres of each other and their Start_Time values are within window of each
+other. Both sides are sorted by time and swept in blocks: for each block of
+crime reports only the dispatches inside the block's time range (widened by the
+window) go into a haversine BallTree, so the work grows with the number of
+nearby candidates instead of n x m.
+
+Each pair gets a confidence between 0 and 1 that falls off linearly with
+distance and with time difference, and pairs are accepted greedily from the
+highest confidence down so every row is used at most once.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6_371_008.8
+FUZZY_STATUS = 'Fuzzy Match'
+
+CRIME_COLUMNS = {'lat': 'Latitude_crime', 'lon': 'Longitude_crime', 'time': 'Start_Time_crime'}
+DISPATCH_COLUMNS = {'lat': 'Latitude_dispatch', 'lon': 'Longitude_dispatch', 'time': 'Start_Time_dispatch'}
+
+
+def _coordinates(df, columns):
+    return np.radians(df[[columns['lat'], columns['lon']]].to_numpy(dtype='float64'))
+
+
+def candidate_pairs(crime, dispatch, radius_m=150, window='2h', block='1D',
+                    crime_columns=CRIME_COLUMNS, dispatch_columns=DISPATCH_COLUMNS):
+    """
+    All crime/dispatch pairs within radius_m and window, with distance, time gap and confidence.
+
+    Returns a frame of crime / dispatch index labels.
+    """
+    window = pd.Timedelta(window).to_timedelta64()
+    block = pd.Timedelta(block).to_timedelta64()
+    radius = radius_m / EARTH_RADIUS_M
+
+    crime = crime.dropna(subset=list(crime_columns.values())).sort_values(crime_columns['time'])
+    dispatch = dispatch.dropna(subset=list(dispatch_columns.values())).sort_values(dispatch_columns['time'])
+    crime_times = crime[crime_columns['time']].to_numpy()
+    dispatch_times = dispatch[dispatch_columns['time']].to_numpy()
+    crime_coords = _coordinates(crime, crime_columns)
+    dispatch_coords = _coordinates(dispatch, dispatch_columns)
+
+    if len(crime) == 0 or len(dispatch) == 0:
+        return _empty_pairs()
+
+    block_starts = np.arange(crime_times[0], crime_times[-1] + block, block)
+    crime_bounds = np.searchsorted(crime_times, block_starts)
+    crime_bounds = np.append(crime_bounds, len(crime_times))
+    found = []
+    for i in range(len(block_starts)):
+        c_lo, c_hi = crime_bounds[i], crime_bounds[i + 1]
+        if c_lo == c_hi:
+            continue
+        d_lo = np.searchsorted(dispatch_times, crime_times[c_lo] - window, side='left')
+        d_hi = np.searchsorted(dispatch_times, crime_times[c_hi - 1] + window, side='right')
+        if d_lo == d_hi:
+            continue
+
+        tree = BallTree(dispatch_coords[d_lo:d_hi], metric='haversine')
+        neighbours, distances = tree.query_radius(crime_coords[c_lo:c_hi], r=radius, return_distance=True)
+        counts = np.fromiter((len(n) for n in neighbours), dtype=np.int64, count=len(neighbours))
+        if counts.sum() == 0:
+            continue
+        c_pos = np.repeat(np.arange(c_lo, c_hi), counts)
+        d_pos = np.concatenate(neighbours) + d_lo
+        dist = np.concatenate(distances) * EARTH_RADIUS_M
+        gap = np.abs(crime_times[c_pos] - dispatch_times[d_pos])
+        in_window = gap <= window
+        found.append((c_pos[in_window], d_pos[in_window], dist[in_window], gap[in_window]))
+
+    if not found:
+        return _empty_pairs()
+    c_pos, d_pos, dist, gap = (np.concatenate(parts) for parts in zip(*found))
+    gap_seconds = gap / np.timedelta64(1, 's')
+    confidence = (1 - dist / radius_m) * (1 - gap_seconds / (window / np.timedelta64(1, 's')))
+    return pd.DataFrame({
+        'crime_index': crime.index.to_numpy()[c_pos],
+        'dispatch_index': dispatch.index.to_numpy()[d_pos],
+        'distance_m': dist,
+        'time_diff_s': gap_seconds,
+        'confidence': confidence,
+    })
+
+
+def _empty_pairs():
+    return pd.DataFrame({
+        'crime_index': pd.Series(dtype='int64'),
+        'dispatch_index': pd.Series(dtype='int64'),
+        'distance_m': pd.Series(dtype='float64'),
+        'time_diff_s': pd.Series(dtype='float64'),
+        'confidence': pd.Series(dtype='float64'),
+    })
+
+
+def select_one_to_one(pairs, min_confidence=0.0):
+    """
+    Keeps the best pairs so that each crime report and dispatch is used at most once
+    """
+    pairs = pairs[pairs['confidence'] >= min_confidence].sort_values('confidence', ascending=False, kind='stable')
+    used_crime, used_dispatch, keep = set(), set(), []
+    for row, (crime_index, dispatch_index) in enumerate(zip(pairs['crime_index'], pairs['dispatch_index'])):
+        if crime_index in used_crime or dispatch_index in used_dispatch:
+            continue
+        used_crime.add(crime_index)
+        used_dispatch.add(dispatch_index)
+        keep.append(row)
+    return pairs.iloc[keep].reset_index(drop=True)
+
+
+def fuzzy_match(joined, radius_m=150, window='2h', block='1D', min_confidence=0.0):
+    """
+    Merges plausible 'Crime'/'Dispatch' leftovers of a join into 'Fuzzy Match' rows.
+
+    joined is a result of pipeline.join.join_incidents. The dispatch row's
+    values fill the empty dispatch columns of the crime row, the dispatch row
+    is dropped, and the pair's confidence is stored in match_confidence.
+    """
+    crime_left = joined[joined['match_status'] == 'Crime']
+    dispatch_left = joined[joined['match_status'] == 'Dispatch']
+    pairs = candidate_pairs(crime_left, dispatch_left, radius_m=radius_m, window=window, block=block)
+    matches = select_one_to_one(pairs, min_confidence)
+    logger.info(f'fuzzy match: {len(pairs)} candidate pairs, {len(matches)} accepted')
+
+    result = joined.copy()
+    if FUZZY_STATUS not in result['match_status'].cat.categories:
+        result['match_status'] = result['match_status'].cat.add_categories([FUZZY_STATUS])
+    result['match_confidence'] = np.where(result['match_status'] == 'Match', 1.0, np.nan)
+    if matches.empty:
+        return result
+
+    crime_rows = result.loc[matches['crime_index']].reset_index(drop=True)
+    dispatch_rows = result.loc[matches['dispatch_index']].reset_index(drop=True)
+    filled_columns = result.columns.drop(['match_status', 'match_confidence'])
+    merged = crime_rows[filled_columns].combine_first(dispatch_rows[filled_columns])
+    merged.index = matches['crime_index'].to_numpy()
+
+    result.loc[merged.index, filled_columns] = merged
+    result.loc[merged.index, 'match_status'] = FUZZY_STATUS
+    result.loc[merged.index, 'match_confidence'] = matches['confidence'].to_numpy()
+    return result.drop(index=matches['dispatch_index'])
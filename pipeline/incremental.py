@@ -0,0 +1,271 @@
+"""
+Incremental monthly refresh of the dashboard aggregates.
+
+The notebooks rebuild every derived file from the full six years of incidents.
+Here the aggregates live in a store partitioned by month, next to a manifest
+with a fingerprint of each source month:
+
+    store/manifest.json
+    store/cube/month_year=2024-05/part.parquet     month x dimension counts (pipeline/cube.py)
+    store/tracts/month_year=2024-05/part.parquet   tract x category counts (pipeline/spatial_join.py)
+    store/tract_totals.parquet                     tract x category over all months
+
+The source is the joined incident data pipeline/cube.py counts (one row per
+crime report / dispatch with Start_Time, Longitude, Latitude, category and the
+other CUBE_DIMENSIONS, as produced in cap_streamlit_datacleaning_v1.ipynb),
+partitioned by month_year the way pipeline/ingest.py writes its output. The raw
+ingest output alone has no match_status or category; it goes through
+pipeline/join.py and pipeline/categories.py first.
+
+A month's fingerprint is the SHA-256 of its files' contents, so re-ingesting or
+copying an unchanged export leaves every month alone. The manifest keeps each
+file's size and mtime next to its digest, and only files whose stat changed are
+hashed again (the stamp-then-hash of data_service/geo_cache.py). refresh() reads
+only the months whose contents are new or changed, rewrites only those
+partitions, and moves tract_totals by the difference between the month's old and
+new counts.
+The linemap extracts and crime_ns2_dash are rollups of the cube, so
+publish_cube() is all they need.
+
+tract_totals is not published to the dashboards. The geographic page reads the
+crime_<type> / dispatch_<type> counts and ratios stored in the scattermap
+TopoJSON, which came out of an offline step that is not in the repository, and
+how its crime types group the categories is not in config/. Until it is,
+read_tract_totals(wide=True) is for checking those counts, and updating the
+TopoJSON (then python -m pipeline.simplify for the map levels) is done by hand.
+
+The manifest is written last, so an interrupted refresh redoes its months on the
+next run; rebuild_totals() re-sums tract_totals from the partitions if the run
+stopped between a partition and the totals.
+
+    python -m pipeline.incremental data/incidents data/aggregates
+"""
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+
+import pandas as pd
+
+from data_service.cube import CUBE_DIMENSIONS
+from pipeline.cube import build_cube, write_cube
+from pipeline.ingest import read_partitions
+from pipeline.spatial_join import assign_tracts, tract_aggregates
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+TRACT_TOTALS = 'tract_totals.parquet'
+TABLES = ['cube', 'tracts']
+TRACT_KEYS = ['tract', 'category']
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_digests(source_dir, known=None):
+    """
+    {path: {'size', 'mtime_ns', 'digest'}} of the files of a month_year partitioned
+    dataset. A file whose size and mtime match its entry in known keeps that digest.
+    """
+    known = known or {}
+    files = {}
+    for path in sorted(Path(source_dir).resolve().glob('month_year=*/*.parquet')):
+        stat = path.stat()
+        entry = known.get(str(path))
+        if entry is None or (entry['size'], entry['mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+            entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'digest': _file_digest(path)}
+        files[str(path)] = entry
+    return files
+
+
+def month_fingerprints(files):
+    """
+    {month: fingerprint} from file_digests(), from the contents of each month's
+    files (names and mtimes left out)
+    """
+    digests = {}
+    for path, entry in files.items():
+        month = Path(path).parent.name.split('=', 1)[1]
+        digests.setdefault(month, []).append(entry['digest'])
+    return {
+        month: hashlib.sha256(''.join(sorted(digests[month])).encode()).hexdigest()
+        for month in sorted(digests)
+    }
+
+
+def load_manifest(store_dir):
+    path = Path(store_dir) / MANIFEST
+    if not path.exists():
+        return {'version': 1, 'months': {}, 'files': {}}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_manifest(store_dir, manifest):
+    path = Path(store_dir) / MANIFEST
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _diff(known, current):
+    changed = [month for month, fingerprint in current.items() if known.get(month, {}).get('fingerprint') != fingerprint]
+    removed = sorted(set(known) - set(current))
+    return changed, removed
+
+
+def changed_months(source_dir, store_dir):
+    """
+    (months that are new or changed, months no longer in the source)
+    """
+    manifest = load_manifest(store_dir)
+    current = month_fingerprints(file_digests(source_dir, manifest.get('files')))
+    return _diff(manifest['months'], current)
+
+
+def partition_path(store_dir, table, month):
+    return Path(store_dir) / table / f'month_year={month}' / 'part.parquet'
+
+
+def _write_parquet(df, path):
+    # Write next to the target and swap, so readers never see half a file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    df.to_parquet(tmp, index=False, compression='zstd')
+    os.replace(tmp, path)
+
+
+def _read_partition(store_dir, table, month):
+    path = partition_path(store_dir, table, month)
+    return pd.read_parquet(path) if path.exists() else None
+
+
+def month_aggregates(incidents, layer, lon_col='Longitude', lat_col='Latitude', category_col='category'):
+    """
+    (cube cells, long tract x category counts) of one month of incidents
+    """
+    required = dict.fromkeys(['Start_Time', lon_col, lat_col, category_col, *CUBE_DIMENSIONS[1:]])
+    missing = [col for col in required if col not in incidents.columns]
+    if missing:
+        raise KeyError(f'{missing} not in the incidents, the source must be the joined incident data')
+    cube = build_cube(incidents)
+    codes = assign_tracts(incidents[lon_col], incidents[lat_col], layer.geometry.geometry.to_numpy())
+    wide = tract_aggregates(codes, layer.geometry[layer.key].to_numpy(), incidents[category_col].astype(str))
+    tracts = wide.rename_axis(columns='category').stack().rename('count').reset_index()
+    tracts = tracts[tracts['count'] > 0].astype({'count': 'int64'})
+    return cube, tracts
+
+
+def apply_delta(totals, old=None, new=None):
+    """
+    totals - old + new on the tract x category counts, rows that drop to zero are removed
+    """
+    parts = [totals]
+    if old is not None:
+        parts.append(old.assign(count=-old['count']))
+    if new is not None:
+        parts.append(new)
+    combined = pd.concat(parts, ignore_index=True).groupby(TRACT_KEYS, as_index=False)['count'].sum()
+    return combined[combined['count'] != 0].reset_index(drop=True)
+
+
+def read_tract_totals(store_dir, wide=False):
+    """
+    Tract x category counts over every month in the store, long or as a tract-indexed table
+    """
+    path = Path(store_dir) / TRACT_TOTALS
+    if path.exists():
+        totals = pd.read_parquet(path)
+    else:
+        # Typed, or the first apply_delta would turn the counts into floats
+        totals = pd.DataFrame({'tract': pd.Series(dtype=object), 'category': pd.Series(dtype=object),
+                               'count': pd.Series(dtype='int64')})
+    if wide:
+        return totals.pivot_table(index='tract', columns='category', values='count', fill_value=0, aggfunc='sum')
+    return totals
+
+
+def refresh(source_dir, store_dir, layer=None, **kwargs):
+    """
+    Brings the store up to date with the source, touching only new, changed or removed months
+    """
+    if layer is None:
+        from data_service.geo_cache import load_geometry
+        layer = load_geometry('scattermap_topo')
+    store_dir = Path(store_dir)
+    manifest = load_manifest(store_dir)
+    files = file_digests(source_dir, manifest.get('files'))
+    current = month_fingerprints(files)
+    changed, removed = _diff(manifest['months'], current)
+    if not changed and not removed:
+        if files != manifest.get('files'):
+            # Touched but not changed, keep the new stats so the files are not hashed again
+            manifest['files'] = files
+            _write_manifest(store_dir, manifest)
+        logger.info('aggregates are up to date')
+        return {'changed': [], 'removed': []}
+
+    totals = read_tract_totals(store_dir)
+    try:
+        for month in changed:
+            incidents = read_partitions(source_dir, months=[month])
+            cube, tracts = month_aggregates(incidents, layer, **kwargs)
+            totals = apply_delta(totals, _read_partition(store_dir, 'tracts', month), tracts)
+            _write_parquet(cube, partition_path(store_dir, 'cube', month))
+            _write_parquet(tracts, partition_path(store_dir, 'tracts', month))
+            manifest['months'][month] = {'fingerprint': current[month], 'rows': len(incidents)}
+            logger.info(f'{month}: {len(incidents)} incidents, {len(cube)} cube cells')
+
+        for month in removed:
+            totals = apply_delta(totals, _read_partition(store_dir, 'tracts', month))
+            for table in TABLES:
+                shutil.rmtree(partition_path(store_dir, table, month).parent, ignore_errors=True)
+            manifest['months'].pop(month, None)
+            logger.info(f'{month}: removed')
+
+        _write_parquet(totals, store_dir / TRACT_TOTALS)
+        manifest['files'] = files
+        _write_manifest(store_dir, manifest)
+    except Exception as e:
+        logger.error(f'error refreshing {store_dir}: {str(e)}')
+        raise
+    return {'changed': changed, 'removed': removed}
+
+
+def rebuild_totals(store_dir):
+    """
+    Re-sums tract_totals from the tract partitions
+    """
+    store_dir = Path(store_dir)
+    parts = [pd.read_parquet(path) for path in sorted((store_dir / 'tracts').glob('month_year=*/part.parquet'))]
+    totals = apply_delta(pd.concat(parts, ignore_index=True)) if parts else read_tract_totals(store_dir).iloc[0:0]
+    _write_parquet(totals, store_dir / TRACT_TOTALS)
+    return totals
+
+
+def publish_cube(store_dir, path=None):
+    """
+    Writes the month partitions as the single incident cube the dashboards read
+    """
+    parts = [pd.read_parquet(path) for path in sorted((Path(store_dir) / 'cube').glob('month_year=*/part.parquet'))]
+    cube = pd.concat(parts, ignore_index=True)
+    dims = [col for col in cube.columns if col not in ('month_year', 'count')]
+    return write_cube(cube.astype({dim: 'category' for dim in dims}), path)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    source_dir, store_dir = sys.argv[1:3]
+    result = refresh(source_dir, store_dir)
+    if result['changed'] or result['removed']:
+        publish_cube(store_dir)
@@ -0,0 +1,161 @@
+"""
+Chunked ingestion of the raw dataMontgomery exports.
+
+PythonCapstone.ipynb reads the full Crime_*.csv and Police_Dispatched_Incidents_*.csv
+exports in one go and cleans the in-memory frames. This module applies the same
+cleaning (drop lists, dropna on coordinates, date parsing and the 2018-06 to
+2024-06 cutoff) one chunk at a time and writes each chunk straight to a Parquet
+dataset partitioned by month_year, so peak memory depends on the chunk size and
+not on the size of the export.
+
+    python -m pipeline.ingest crime "Crime_20240906.csv" data/crime
+    python -m pipeline.ingest dispatch "Police_Dispatched_Incidents_20240906.csv" data/dispatch
+"""
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+import logging
+import sys
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+DATE_FORMAT = '%m/%d/%Y %I:%M:%S %p'
+
+# Cutoff is set from the 1st of June 2018 to 1st of June 2024 because of changes to
+# underlying systems made in 2018, and because crime reports take some time to be registered.
+START_CUTOFF = datetime(2018, 6, 1)
+END_CUTOFF = datetime(2024, 6, 1)
+
+SOURCES = {
+    'crime': {
+        'drop': ['Block Address', 'City', 'State', 'Zip Code', 'Address Number', 'Street Prefix',
+                 'Street Name', 'Street Suffix', 'Street Type', 'Location', 'Beat', 'Sector',
+                 'NIBRS Code', 'Police District Name'],
+        'dtypes': {
+            'Incident ID': 'Int64', 'Offence Code': 'str', 'CR Number': 'Int64', 'Victims': 'Int64',
+            'Crime Name1': 'str', 'Crime Name2': 'str', 'Crime Name3': 'str', 'Agency': 'str',
+            'Place': 'str', 'PRA': 'float64', 'Latitude': 'float64', 'Longitude': 'float64',
+            'Police District Number': 'str',
+        },
+        'dropna': ['End_Date_Time', 'Longitude', 'Latitude'],
+        'dates': ['Dispatch Date / Time', 'Start_Date_Time', 'End_Date_Time'],
+        'rename': {'Start_Date_Time': 'Start_Time', 'Dispatch Date / Time': 'Dispatch_Time',
+                   'End_Date_Time': 'End_Time'},
+    },
+    'dispatch': {
+        'drop': ['Crash Reports', 'Address', 'City', 'State', 'Zip', 'Location', 'Beat',
+                 'Disposition Desc', 'CallTime CallRoute', 'Calltime Dispatch', 'Calltime Arrive',
+                 'Calltime Cleared', 'CallRoute Dispatch', 'Dispatch Arrive'],
+        'dtypes': {
+            'Incident_ID': 'str', 'Crime Reports': 'str', 'Priority': 'Int64', 'Initial Type': 'str',
+            'Close Type': 'str', 'Longitude': 'float64', 'Latitude': 'float64',
+            'Police District Number': 'str', 'PRA': 'float64', 'Arrive Cleared': 'float64',
+        },
+        'dropna': ['Longitude', 'Latitude'],
+        'dates': ['Start Time', 'End Time'],
+        'rename': {'Start Time': 'Start_Time', 'End Time': 'End_Time'},
+    },
+}
+
+ARROW_TYPES = {'Int64': pa.int64(), 'str': pa.string(), 'float64': pa.float64()}
+
+
+def arrow_schema(source, columns=None):
+    """
+    Arrow schema of the cleaned chunks of a source, the same for every chunk
+
+    Without it each chunk's schema is inferred on its own, and a text column that
+    is empty in one chunk is written with the null type, which the other partitions
+    cannot be read back with. Columns of the export not in SOURCES are read as text.
+    """
+    config = SOURCES[source]
+    types = {config['rename'].get(col, col): ARROW_TYPES[dtype] for col, dtype in config['dtypes'].items()}
+    types.update({config['rename'].get(col, col): pa.timestamp('ns') for col in config['dates']})
+    types['month_year'] = pa.string()
+    if columns is not None:
+        types = {col: types.get(col, pa.string()) for col in columns}
+    return pa.schema(list(types.items()))
+
+
+def clean_chunk(chunk, source):
+    """
+    Applies the notebook cleaning steps to one chunk of an export
+    """
+    config = SOURCES[source]
+    chunk = chunk.dropna(subset=config['dropna'])
+    chunk = chunk.assign(**{col: pd.to_datetime(chunk[col], format=DATE_FORMAT, errors='coerce') for col in config['dates']})
+    chunk = chunk.rename(columns=config['rename'])
+    chunk = chunk[(chunk['Start_Time'] >= START_CUTOFF) & (chunk['Start_Time'] <= END_CUTOFF)]
+    return chunk.assign(month_year=chunk['Start_Time'].dt.strftime('%Y-%m'))
+
+
+def iter_clean_chunks(path, source, chunksize=250_000):
+    """
+    Yields cleaned chunks of a raw export, reading only the columns that are kept
+    """
+    config = SOURCES[source]
+    drop = set(config['drop'])
+    reader = pd.read_csv(
+        path,
+        usecols=lambda col: col not in drop,
+        # Columns not listed in dtypes are kept as text, as arrow_schema expects
+        dtype=defaultdict(lambda: 'str', config['dtypes']),
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        yield clean_chunk(chunk, source)
+
+
+def ingest_export(path, source, out_dir, chunksize=250_000, overwrite=False):
+    """
+    Streams a raw export into a Parquet dataset under out_dir partitioned by month_year
+    """
+    out_dir = Path(out_dir)
+    if out_dir.exists() and any(out_dir.iterdir()):
+        if not overwrite:
+            raise FileExistsError(f'{out_dir} is not empty, pass overwrite=True to replace it')
+        for old_file in out_dir.glob('month_year=*/*.parquet'):
+            old_file.unlink()
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    stats = {'chunks': 0, 'rows_written': 0}
+    schema = None
+    for i, chunk in enumerate(iter_clean_chunks(path, source, chunksize)):
+        stats['chunks'] += 1
+        if chunk.empty:
+            continue
+        if schema is None:
+            # Fixed from the first chunk's columns so every partition file shares it
+            schema = arrow_schema(source, chunk.columns)
+        pq.write_to_dataset(
+            pa.Table.from_pandas(chunk, schema=schema, preserve_index=False),
+            root_path=out_dir,
+            partition_cols=['month_year'],
+            basename_template=f'chunk{i:05d}-{{i}}.parquet',
+            existing_data_behavior='overwrite_or_ignore',
+        )
+        stats['rows_written'] += len(chunk)
+        logger.debug(f'{source} chunk {i}: {len(chunk)} rows kept')
+    logger.info(f"{source}: {stats['rows_written']} rows in {stats['chunks']} chunks written to {out_dir}")
+    return stats
+
+
+def read_partitions(out_dir, months=None, columns=None):
+    """
+    Reads an ingested dataset back, optionally only some months and columns
+    """
+    filters = [('month_year', 'in', list(months))] if months else None
+    df = pd.read_parquet(out_dir, columns=columns, filters=filters)
+    if 'month_year' in df.columns:
+        df['month_year'] = df['month_year'].astype(str)
+    return df
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    source, path, out_dir = sys.argv[1:4]
+    ingest_export(path, source, out_dir, overwrite=True)
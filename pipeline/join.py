@@ -0,0 +1,171 @@
+"""
+Crime report <-> dispatch join.
+
+PythonCapstone.ipynb joins the two datasets with full outer merges, once on ID
+(CR Number <-> Crime Reports) and once on Incident_ID, and maps _merge to
+Match/Crime/Dispatch. Here both keys are normalized to int64 once and the
+dispatch side is sorted once per key, so each strategy is a searchsorted over
+the crime keys instead of a new full-frame merge:
+
+- 'ID': outer join on the crime report number
+- 'Incident_ID': outer join on the incident number
+- 'cascade': ID first, then Incident_ID for the rows ID left unmatched
+
+All strategies are returned from a single call to join_incidents.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+KEYS = ['ID', 'Incident_ID']
+STRATEGIES = ['ID', 'Incident_ID', 'cascade']
+MATCH_STATUS = pd.CategoricalDtype(['Dispatch', 'Crime', 'Match'])
+SUFFIXES = ('_crime', '_dispatch')
+# Dispatches without a crime report number are coerced to 0, which never matches
+MISSING_KEY = 0
+
+
+def normalize_keys(crime, dispatch):
+    """
+    Renames the join columns to ID / Incident_ID and casts them to int64, as in the notebook
+    """
+    crime = crime.rename(columns={'CR Number': 'ID', 'Incident ID': 'Incident_ID'})
+    dispatch = dispatch.rename(columns={'Crime Reports': 'ID'})
+    crime = crime.assign(
+        ID=pd.to_numeric(crime['ID'], errors='coerce').fillna(MISSING_KEY).astype('int64'),
+        Incident_ID=pd.to_numeric(crime['Incident_ID'], errors='coerce').fillna(MISSING_KEY).astype('int64'),
+    )
+    dispatch = dispatch.assign(
+        ID=pd.to_numeric(dispatch['ID'], errors='coerce').fillna(MISSING_KEY).astype('int64'),
+        Incident_ID=pd.to_numeric(
+            dispatch['Incident_ID'].astype(str).str.replace('P', '', regex=False), errors='coerce'
+        ).fillna(MISSING_KEY).astype('int64'),
+    )
+    return crime.reset_index(drop=True), dispatch.reset_index(drop=True)
+
+
+class SortedKeyIndex:
+    """
+    Sorted view of one key column, answering many-to-many lookups with searchsorted
+    """
+
+    def __init__(self, keys):
+        self.order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[self.order]
+
+    def match(self, probe_keys, probe_positions=None, candidates=None):
+        """
+        Returns (probe_idx, indexed_idx) for every matching pair.
+
+        probe_positions limits the lookup to some rows of the probe side and
+        candidates (boolean mask over the indexed side) to some indexed rows.
+        """
+        if probe_positions is None:
+            probe_positions = np.arange(len(probe_keys))
+        keys = probe_keys[probe_positions]
+        valid = keys != MISSING_KEY
+        probe_positions, keys = probe_positions[valid], keys[valid]
+
+        lo = np.searchsorted(self.sorted_keys, keys, side='left')
+        hi = np.searchsorted(self.sorted_keys, keys, side='right')
+        counts = hi - lo
+        probe_idx = np.repeat(probe_positions, counts)
+        # Offsets 0..count-1 inside each run of equal keys
+        run_starts = np.repeat(lo, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        indexed_idx = self.order[run_starts + offsets]
+
+        if candidates is not None:
+            keep = candidates[indexed_idx]
+            probe_idx, indexed_idx = probe_idx[keep], indexed_idx[keep]
+        return probe_idx, indexed_idx
+
+
+def _assemble(crime, dispatch, crime_idx, dispatch_idx, coalesce):
+    """
+    Builds the joined frame from aligned position arrays (-1 = no row on that side)
+    """
+    left = crime.reindex(crime_idx).reset_index(drop=True)
+    right = dispatch.reindex(dispatch_idx).reset_index(drop=True)
+
+    has_crime = crime_idx >= 0
+    has_dispatch = dispatch_idx >= 0
+    status = np.where(has_crime & has_dispatch, 'Match', np.where(has_crime, 'Crime', 'Dispatch'))
+
+    overlap = [col for col in left.columns if col in right.columns and col not in coalesce]
+    left = left.rename(columns={col: col + SUFFIXES[0] for col in overlap})
+    right = right.rename(columns={col: col + SUFFIXES[1] for col in overlap})
+
+    joined = pd.concat([left, right.drop(columns=coalesce)], axis=1)
+    for key in coalesce:
+        # Prefer the crime report value, filled in from the dispatch side
+        joined[key] = np.where(has_crime, crime[key].to_numpy()[crime_idx], dispatch[key].to_numpy()[dispatch_idx])
+    joined['match_status'] = pd.Categorical(status, dtype=MATCH_STATUS)
+    return joined
+
+
+def _outer_positions(n_crime, n_dispatch, crime_idx, dispatch_idx):
+    """
+    Adds the unmatched rows of both sides to a list of matched pairs
+    """
+    crime_only = np.setdiff1d(np.arange(n_crime), crime_idx)
+    dispatch_only = np.setdiff1d(np.arange(n_dispatch), dispatch_idx)
+    all_crime = np.concatenate([crime_idx, crime_only, np.full(len(dispatch_only), -1)])
+    all_dispatch = np.concatenate([dispatch_idx, np.full(len(crime_only), -1), dispatch_only])
+    return all_crime, all_dispatch
+
+
+def join_incidents(crime, dispatch, strategies=STRATEGIES, normalized=False):
+    """
+    Runs the requested join strategies, sharing the key normalization and indexes.
+
+    Returns a dict of strategy -> joined frame with a categorical match_status.
+    The cascade result also has a match_key column saying which key matched.
+    """
+    unknown = set(strategies) - set(STRATEGIES)
+    if unknown:
+        raise ValueError(f'Unknown join strategies: {sorted(unknown)}')
+    if not normalized:
+        crime, dispatch = normalize_keys(crime, dispatch)
+
+    keys = {key: (crime[key].to_numpy(), dispatch[key].to_numpy()) for key in KEYS}
+    indexes = {key: SortedKeyIndex(keys[key][1]) for key in KEYS}
+    n_crime, n_dispatch = len(crime), len(dispatch)
+
+    pairs = {}
+    for key in KEYS:
+        if key in strategies or 'cascade' in strategies:
+            pairs[key] = indexes[key].match(keys[key][0])
+
+    results = {}
+    for key in KEYS:
+        if key in strategies:
+            crime_idx, dispatch_idx = _outer_positions(n_crime, n_dispatch, *pairs[key])
+            results[key] = _assemble(crime, dispatch, crime_idx, dispatch_idx, coalesce=[key])
+
+    if 'cascade' in strategies:
+        id_crime, id_dispatch = pairs['ID']
+        # Incident_ID only gets the rows the ID join could not place
+        crime_left = np.ones(n_crime, dtype=bool)
+        crime_left[id_crime] = False
+        dispatch_left = np.ones(n_dispatch, dtype=bool)
+        dispatch_left[id_dispatch] = False
+        inc_crime, inc_dispatch = indexes['Incident_ID'].match(
+            keys['Incident_ID'][0], probe_positions=np.flatnonzero(crime_left), candidates=dispatch_left
+        )
+        matched_crime = np.concatenate([id_crime, inc_crime])
+        matched_dispatch = np.concatenate([id_dispatch, inc_dispatch])
+        crime_idx, dispatch_idx = _outer_positions(n_crime, n_dispatch, matched_crime, matched_dispatch)
+        cascade = _assemble(crime, dispatch, crime_idx, dispatch_idx, coalesce=KEYS)
+        match_key = np.full(len(cascade), None, dtype=object)
+        match_key[:len(id_crime)] = 'ID'
+        match_key[len(id_crime):len(matched_crime)] = 'Incident_ID'
+        cascade['match_key'] = pd.Categorical(match_key, categories=KEYS)
+        results['cascade'] = cascade
+
+    for strategy, joined in results.items():
+        logger.info(f'{strategy} join: {joined["match_status"].value_counts().to_dict()}')
+    return results
@@ -0,0 +1,213 @@
+"""
+Builds the simplified, quantized copies of the tract TopoJSON.
+
+Simplification runs on the TopoJSON arcs rather than on the polygons. Every
+boundary between two tracts is a single shared arc, so both neighbours get the
+same simplified line and no gaps or overlaps open up between them; arc end
+points (where three or more tracts meet) are always kept. The simplified arcs
+are then quantized to an integer grid and delta-encoded, which is what makes
+TopoJSON small on the wire. Every level is checked for invalid polygons after
+quantization, build_levels refuses to write one that has any.
+
+    python -m pipeline.simplify
+"""
+import json
+import logging
+
+import numpy as np
+import shapely
+
+from data_service.geo_cache import GEOMETRY_LEVELS, KEY, level_dataset
+from data_service.registry import local_path
+
+logger = logging.getLogger(__name__)
+
+MAX_REFINEMENTS = 6
+
+
+def decode_arcs(topology):
+    """
+    Arcs as arrays of absolute coordinates, undoing the quantization if there is one
+    """
+    transform = topology.get('transform')
+    arcs = []
+    for arc in topology['arcs']:
+        coords = np.asarray(arc, dtype='float64')
+        if transform:
+            coords = np.cumsum(coords, axis=0) * transform['scale'] + transform['translate']
+        arcs.append(coords)
+    return arcs
+
+
+def simplify_arcs(arcs, tolerance):
+    """
+    Douglas-Peucker per arc (end points are kept), closed arcs keep at least a valid ring.
+    tolerance is a scalar or one value per arc.
+    """
+    lengths = np.array([len(arc) for arc in arcs])
+    lines = shapely.linestrings(np.concatenate(arcs), indices=np.repeat(np.arange(len(arcs)), lengths))
+    simplified = shapely.simplify(lines, tolerance, preserve_topology=True)
+
+    result = []
+    for arc, line in zip(arcs, simplified):
+        coords = shapely.get_coordinates(line)
+        closed = np.array_equal(arc[0], arc[-1])
+        result.append(arc if closed and len(coords) < 4 else coords)
+    return result
+
+
+def _ring(arcs, indices):
+    # A negative index ~i is arc i walked backwards, consecutive arcs share their end point
+    parts = [arcs[i] if i >= 0 else arcs[~i][::-1] for i in indices]
+    return np.concatenate([parts[0]] + [part[1:] for part in parts[1:]])
+
+
+def _polygons(geometry):
+    if geometry['type'] == 'Polygon':
+        return [geometry['arcs']]
+    if geometry['type'] == 'MultiPolygon':
+        return geometry['arcs']
+    return []
+
+
+def geometry_shapes(geometries, arcs):
+    """
+    Shapely (multi)polygons of the TopoJSON geometries built from the given arcs
+    """
+    return [
+        shapely.MultiPolygon([
+            shapely.Polygon(_ring(arcs, rings[0]), [_ring(arcs, hole) for hole in rings[1:]])
+            for rings in _polygons(geometry)
+        ])
+        for geometry in geometries
+    ]
+
+
+def invalid_geometries(geometries, arcs):
+    """
+    The TopoJSON geometries whose polygons are not valid when built from the given arcs
+    """
+    return [geometry for geometry, shape in zip(geometries, geometry_shapes(geometries, arcs)) if not shape.is_valid]
+
+
+def _arc_ids(geometry):
+    return sorted({i if i >= 0 else ~i for rings in _polygons(geometry) for ring in rings for i in ring})
+
+
+def quantize_arcs(arcs, bbox, quantization):
+    """
+    Integer, delta-encoded arcs plus the TopoJSON transform to decode them
+    """
+    x0, y0, x1, y1 = bbox
+    scale = np.array([(x1 - x0) / (quantization - 1) or 1.0, (y1 - y0) / (quantization - 1) or 1.0])
+    translate = np.array([x0, y0])
+
+    encoded = []
+    for arc in arcs:
+        points = np.round((arc - translate) / scale).astype(np.int64)
+        # Points that fall on the same grid cell add nothing, end points always stay
+        keep = np.ones(len(points), dtype=bool)
+        keep[1:-1] = np.any(points[1:-1] != points[:-2], axis=1)
+        if keep.sum() >= (4 if np.array_equal(arc[0], arc[-1]) else 2):
+            points = points[keep]
+        deltas = np.diff(points, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+        encoded.append(deltas.tolist())
+    return encoded, {'scale': scale.tolist(), 'translate': translate.tolist()}
+
+
+def simplify_topology(topology, tolerance, quantization, properties=None):
+    """
+    A copy of the topology with simplified, quantized arcs.
+
+    Arcs are simplified independently, so two arcs of one ring can end up
+    crossing. The arcs of any polygon that simplification made invalid are
+    redone with a smaller tolerance. Snapping to the grid can then make a ring
+    touch or cross itself, in which case the grid is made twice as fine. If
+    either step is still invalid after MAX_REFINEMENTS rounds, the arcs are
+    written unquantized, with the source arcs for any polygon still invalid.
+    properties, when given, is the list of feature properties to keep.
+    """
+    source = decode_arcs(topology)
+    bbox = topology.get('bbox') or [
+        min(arc[:, 0].min() for arc in source), min(arc[:, 1].min() for arc in source),
+        max(arc[:, 0].max() for arc in source), max(arc[:, 1].max() for arc in source),
+    ]
+    geometries = [geometry for obj in topology['objects'].values() for geometry in obj.get('geometries', [obj])]
+
+    tolerances = np.full(len(source), float(tolerance))
+    for _ in range(MAX_REFINEMENTS):
+        arcs = simplify_arcs(source, tolerances)
+        invalid = invalid_geometries(geometries, arcs)
+        if not invalid:
+            break
+        for geometry in invalid:
+            tolerances[_arc_ids(geometry)] /= 4
+
+    transform = None
+    if not invalid:
+        for _ in range(MAX_REFINEMENTS):
+            encoded, transform = quantize_arcs(arcs, bbox, quantization)
+            invalid = invalid_geometries(geometries, decode_arcs({'arcs': encoded, 'transform': transform}))
+            if not invalid:
+                break
+            quantization *= 2
+    if invalid:
+        logger.warning(f'{len(invalid)} geometries still invalid after {MAX_REFINEMENTS} refinements, writing unquantized arcs')
+        arcs = list(arcs)
+        invalid = invalid_geometries(geometries, arcs)
+        while invalid:
+            # Source arcs are shared with the neighbours, so check again until nothing is left
+            for geometry in invalid:
+                for i in _arc_ids(geometry):
+                    arcs[i] = source[i]
+            invalid = invalid_geometries(geometries, arcs)
+        encoded, transform = [arc.tolist() for arc in arcs], None
+
+    objects = topology['objects']
+    if properties is not None:
+        objects = {
+            key: {**obj, 'geometries': [
+                {**geometry, 'properties': {k: v for k, v in geometry.get('properties', {}).items() if k in properties}}
+                for geometry in obj.get('geometries', [])
+            ]}
+            for key, obj in objects.items()
+        }
+    simplified = {**topology, 'objects': objects, 'bbox': list(bbox), 'transform': transform, 'arcs': encoded}
+    if transform is None:
+        del simplified['transform']
+    return simplified
+
+
+def build_levels(name='scattermap_topo', levels=None, properties=(KEY,)):
+    """
+    Writes one simplified copy per level where the registry expects it (static/), returns their paths.
+
+    Only the tract id is kept as a property, the pages look the values up from
+    the attribute table.
+    """
+    with open(local_path(name), encoding='utf-8') as f:
+        topology = json.load(f)
+    source_points = sum(len(arc) for arc in topology['arcs'])
+
+    paths = {}
+    for level in levels or GEOMETRY_LEVELS:
+        settings = GEOMETRY_LEVELS[level]
+        simplified = simplify_topology(topology, settings['tolerance'], settings['quantization'], properties)
+        geometries = [geometry for obj in simplified['objects'].values() for geometry in obj.get('geometries', [obj])]
+        invalid = invalid_geometries(geometries, decode_arcs(simplified))
+        if invalid:
+            raise ValueError(f'{level}: {len(invalid)} invalid geometries, e.g. {invalid[0].get("properties")}')
+        path = local_path(level_dataset(name, level))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(simplified, f, separators=(',', ':'))
+        points = sum(len(arc) for arc in simplified['arcs'])
+        grid = simplified['transform']['scale'] if 'transform' in simplified else 'unquantized'
+        logger.info(f'{level}: {source_points} -> {points} arc points, grid {grid}, {path.stat().st_size / 1024:.0f} KB')
+        paths[level] = path
+    return paths
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    build_levels()
@@ -0,0 +1,149 @@
+"""
+Assigns incidents to census tracts.
+
+The per-tract crime_* / dispatch_* counts in capstone_streamlit_scattermap.csv
+came out of an offline step that is not in the repository. This module redoes
+the spatial part from the incident coordinates: every chunk of points goes
+into a shapely STRtree that is queried in bulk with all tract polygons at once
+(STRtree.query(polygons, predicate='intersects')). The tree is over the points
+rather than the polygons because shapely prepares the query geometries, and a
+prepared polygon answers point tests an order of magnitude faster. Chunks are
+spread over worker processes, each of which prepares the polygons once.
+
+A point on a shared border intersects both tracts and is given to the first
+one in layer order, so every incident is counted exactly once. Points outside
+every tract get code -1.
+
+    python -m pipeline.spatial_join incidents.parquet incident_tracts.parquet
+"""
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import shapely
+
+logger = logging.getLogger(__name__)
+
+CHUNKSIZE = 250_000
+NO_TRACT = -1
+
+_worker_polygons = None
+
+
+def prepare_polygons(polygons):
+    """
+    Tract polygons (shapely geometries or WKB) prepared for repeated point tests
+    """
+    polygons = np.asarray(polygons, dtype=object)
+    if len(polygons) and isinstance(polygons[0], bytes):
+        polygons = shapely.from_wkb(polygons)
+    shapely.prepare(polygons)
+    return polygons
+
+
+def locate(polygons, lon, lat):
+    """
+    Tract position (in polygons order) of every point, NO_TRACT when it falls in none
+    """
+    lon = np.asarray(lon, dtype='float64')
+    lat = np.asarray(lat, dtype='float64')
+    codes = np.full(len(lon), NO_TRACT, dtype=np.int32)
+    valid = np.isfinite(lon) & np.isfinite(lat)
+    points = shapely.points(lon[valid], lat[valid])
+    tract_idx, point_idx = shapely.STRtree(points).query(polygons, predicate='intersects')
+    if len(point_idx):
+        # Border points hit two tracts: sort by (point, tract) and keep the first tract per point
+        order = np.lexsort((tract_idx, point_idx))
+        point_idx, tract_idx = point_idx[order], tract_idx[order]
+        first = np.r_[True, point_idx[1:] != point_idx[:-1]]
+        located = np.full(len(points), NO_TRACT, dtype=np.int32)
+        located[point_idx[first]] = tract_idx[first]
+        codes[valid] = located
+    return codes
+
+
+def _init_worker(polygons_wkb):
+    global _worker_polygons
+    _worker_polygons = prepare_polygons(polygons_wkb)
+
+
+def _locate_chunk(chunk):
+    lon, lat = chunk
+    return locate(_worker_polygons, lon, lat)
+
+
+def assign_tracts(lon, lat, polygons, chunksize=CHUNKSIZE, processes=None):
+    """
+    Tract position of every point, chunked and spread over worker processes.
+
+    Runs in this process when there is a single chunk or processes=1.
+    """
+    lon = np.asarray(lon, dtype='float64')
+    lat = np.asarray(lat, dtype='float64')
+    bounds = range(0, len(lon), chunksize)
+    processes = processes or os.cpu_count() or 1
+
+    if len(bounds) <= 1 or processes == 1:
+        polygons = prepare_polygons(polygons)
+        return np.concatenate([locate(polygons, lon[i:i + chunksize], lat[i:i + chunksize]) for i in bounds] or
+                              [np.empty(0, dtype=np.int32)])
+
+    polygons_wkb = shapely.to_wkb(np.asarray(polygons, dtype=object))
+    chunks = ((lon[i:i + chunksize], lat[i:i + chunksize]) for i in bounds)
+    try:
+        with ProcessPoolExecutor(max_workers=min(processes, len(bounds)), initializer=_init_worker,
+                                 initargs=(polygons_wkb,)) as pool:
+            codes = np.concatenate(list(pool.map(_locate_chunk, chunks)))
+    except Exception as e:
+        logger.error(f'error assigning tracts: {str(e)}')
+        raise
+    logger.debug(f'{len(lon)} points in {len(bounds)} chunks, {(codes == NO_TRACT).sum()} outside every tract')
+    return codes
+
+
+def tract_aggregates(codes, tracts, labels=None, prefix=''):
+    """
+    Incident counts per tract (rows) and label (columns) from the tract codes.
+
+    labels is an optional per-incident category (crime type, source, ...);
+    without it there is a single 'count' column. Incidents outside every tract
+    are left out.
+    """
+    codes = np.asarray(codes)
+    inside = codes != NO_TRACT
+    if labels is None:
+        counts = np.bincount(codes[inside], minlength=len(tracts))
+        return pd.DataFrame({f'{prefix}count': counts}, index=pd.Index(tracts, name='tract'))
+
+    labels = pd.Categorical(np.asarray(labels)[inside])
+    flat = codes[inside].astype(np.int64) * len(labels.categories) + labels.codes
+    # Incidents without a label (code -1) would land in the previous tract's last column
+    flat = flat[labels.codes >= 0]
+    counts = np.bincount(flat, minlength=len(tracts) * len(labels.categories))
+    return pd.DataFrame(
+        counts.reshape(len(tracts), len(labels.categories)),
+        index=pd.Index(tracts, name='tract'),
+        columns=[f'{prefix}{label}' for label in labels.categories],
+    )
+
+
+def assign_incidents(incidents, layer, lon_col='Longitude', lat_col='Latitude', **kwargs):
+    """
+    The incidents' tract ids as a categorical Series aligned with incidents
+    """
+    codes = assign_tracts(incidents[lon_col], incidents[lat_col], layer.geometry.geometry.to_numpy(), **kwargs)
+    tracts = layer.geometry[layer.key].to_numpy()
+    return pd.Series(pd.Categorical.from_codes(codes, categories=tracts), index=incidents.index, name=layer.key)
+
+
+if __name__ == '__main__':
+    from data_service.geo_cache import load_geometry
+
+    logging.basicConfig(level=logging.INFO)
+    incidents = pd.read_parquet(sys.argv[1])
+    tract = assign_incidents(incidents, load_geometry('scattermap_topo'))
+    logger.info(f'{tract.notna().sum()} of {len(tract)} incidents assigned to a tract')
+    incidents.assign(tract=tract).to_parquet(sys.argv[2], index=False)
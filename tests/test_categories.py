@@ -0,0 +1,76 @@
+"""
+pipeline/categories.py against the Series.map + fillna of cap_streamlit_datacleaning_v1.ipynb
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.categories import assign_category, load_category_map
+
+# The notebook's fillna downcasts an all-missing object column
+pytestmark = pytest.mark.filterwarnings('ignore:Downcasting object dtype arrays:FutureWarning')
+
+
+@pytest.fixture
+def category_map():
+    return load_category_map()
+
+
+def notebook_category(df, category_map):
+    # The notebook's dicts carry the missing label under an np.nan key
+    crime_dict = {np.nan: category_map['crime']['missing'], **category_map['crime']['map']}
+    dispatch_dict = {np.nan: category_map['dispatch']['missing'], **category_map['dispatch']['map']}
+    categories_crime = df['Crime Name2'].map(crime_dict)
+    categories_dispatch = df['Close Type'].map(dispatch_dict)
+    return categories_crime.fillna(categories_dispatch)
+
+
+def test_matches_notebook(category_map):
+    crime_values = list(category_map['crime']['map'])
+    dispatch_values = list(category_map['dispatch']['map'])
+    rng = np.random.default_rng(0)
+    n = 500
+    crime = pd.Series(crime_values + [np.nan, 'not a crime name'], dtype=object)
+    dispatch = pd.Series(dispatch_values + [np.nan, 'NOT A CLOSE TYPE'], dtype=object)
+    df = pd.DataFrame({
+        'Crime Name2': crime.iloc[rng.integers(0, len(crime), n)].to_numpy(),
+        'Close Type': dispatch.iloc[rng.integers(0, len(dispatch), n)].to_numpy(),
+    }, index=np.arange(n) * 2)
+
+    result, _ = assign_category(df, category_map)
+
+    expected = notebook_category(df, category_map)
+    pd.testing.assert_series_equal(
+        result['category'].astype(object), expected.astype(object), check_names=False
+    )
+
+
+def test_missing_precedence(category_map):
+    crime_value = next(iter(category_map['crime']['map']))
+    close_type, dispatch_label = next(iter(category_map['dispatch']['map'].items()))
+    df = pd.DataFrame({
+        'Crime Name2': [np.nan, 'not a crime name', 'not a crime name', np.nan, crime_value],
+        'Close Type': [close_type, close_type, np.nan, 'NOT A CLOSE TYPE', np.nan],
+    })
+
+    result, report = assign_category(df, category_map)
+
+    assert result['category'].astype(object).tolist() == [
+        # A missing crime report wins over the dispatch, as np.nan is a key of crime_dict
+        category_map['crime']['missing'],
+        dispatch_label,
+        category_map['dispatch']['missing'],
+        category_map['crime']['missing'],
+        category_map['crime']['map'][crime_value],
+    ]
+    assert result['category'].astype(object).tolist() == notebook_category(df, category_map).tolist()
+    assert report.set_index('value')['rows'].to_dict() == {'not a crime name': 2, 'NOT A CLOSE TYPE': 1}
+
+
+def test_both_unmapped_stay_empty(category_map):
+    df = pd.DataFrame({'Crime Name2': ['not a crime name'], 'Close Type': ['NOT A CLOSE TYPE']})
+
+    result, _ = assign_category(df, category_map)
+
+    assert result['category'].isna().all()
+    assert notebook_category(df, category_map).isna().all()
@@ -0,0 +1,42 @@
+"""
+IncidentCube rollups against pandas groupby
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_service.cube import IncidentCube
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(2)
+    return pd.DataFrame({
+        'month_year': pd.to_datetime(rng.choice(['2020-01', '2020-02', '2020-03'], 300)),
+        'Agency': rng.choice(['MCPD', 'RPD', 'GPD', None], 300),
+        'category': rng.choice(['theft', 'drug', 'assault'], 300),
+        'count': rng.integers(1, 20, 300),
+    })
+
+
+@pytest.mark.parametrize('dims', [['month_year'], ['Agency', 'category'], ['month_year', 'Agency', 'category']])
+def test_rollup_matches_groupby(frame, dims):
+    expected = frame.groupby(dims)['count'].sum().reset_index()
+    result = IncidentCube(frame).rollup(dims)
+    for dim in dims:
+        result[dim] = result[dim].astype(expected[dim].dtype)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_rollup_filters(frame):
+    result = IncidentCube(frame).rollup(['category'], filters={'Agency': ['MCPD', 'RPD']})
+    expected = frame[frame['Agency'].isin(['MCPD', 'RPD'])].groupby('category')['count'].sum()
+    assert result.set_index('category')['count'].astype(int).to_dict() == expected.to_dict()
+
+
+def test_grand_total(frame):
+    cube = IncidentCube(frame)
+    assert cube.rollup([])['count'].tolist() == [frame['count'].sum()]
+    assert cube.rollup([], filters={'category': 'theft'})['count'].tolist() == [
+        frame.loc[frame['category'] == 'theft', 'count'].sum()
+    ]
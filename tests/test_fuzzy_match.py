@@ -0,0 +1,69 @@
+"""
+pipeline/fuzzy_match.py against a brute-force search over every pair
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.fuzzy_match import EARTH_RADIUS_M, FUZZY_STATUS, candidate_pairs, fuzzy_match, select_one_to_one
+
+
+def incidents(rng, n, suffix):
+    return pd.DataFrame({
+        f'Latitude_{suffix}': 39.1 + rng.uniform(0, 0.01, n),
+        f'Longitude_{suffix}': -77.2 + rng.uniform(0, 0.01, n),
+        f'Start_Time_{suffix}': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.uniform(0, 72, n), unit='h'),
+    })
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+@pytest.fixture
+def sides():
+    rng = np.random.default_rng(1)
+    return incidents(rng, 120, 'crime'), incidents(rng, 150, 'dispatch')
+
+
+def test_candidates_match_brute_force(sides):
+    crime, dispatch = sides
+    pairs = candidate_pairs(crime, dispatch, radius_m=150, window='2h', block='6h')
+
+    c, d = np.meshgrid(np.arange(len(crime)), np.arange(len(dispatch)), indexing='ij')
+    c, d = c.ravel(), d.ravel()
+    dist = haversine(crime['Latitude_crime'].to_numpy()[c], crime['Longitude_crime'].to_numpy()[c],
+                     dispatch['Latitude_dispatch'].to_numpy()[d], dispatch['Longitude_dispatch'].to_numpy()[d])
+    gap = np.abs(crime['Start_Time_crime'].to_numpy()[c] - dispatch['Start_Time_dispatch'].to_numpy()[d])
+    keep = (dist <= 150) & (gap <= np.timedelta64(2, 'h'))
+    assert keep.sum() > 0
+
+    expected = set(zip(c[keep], d[keep]))
+    assert set(zip(pairs['crime_index'], pairs['dispatch_index'])) == expected
+    assert pairs['confidence'].between(0, 1).all()
+
+
+def test_one_to_one(sides):
+    pairs = select_one_to_one(candidate_pairs(*sides))
+    assert pairs['crime_index'].is_unique
+    assert pairs['dispatch_index'].is_unique
+    assert pairs['confidence'].is_monotonic_decreasing
+
+
+def test_fuzzy_match_merges_leftovers():
+    time = pd.Timestamp('2020-01-01 12:00')
+    joined = pd.DataFrame({
+        'Latitude_crime': [39.1, np.nan, 39.5],
+        'Longitude_crime': [-77.2, np.nan, -77.5],
+        'Start_Time_crime': [time, pd.NaT, time],
+        'Latitude_dispatch': [np.nan, 39.1001, np.nan],
+        'Longitude_dispatch': [np.nan, -77.2, np.nan],
+        'Start_Time_dispatch': [pd.NaT, time + pd.Timedelta('10min'), pd.NaT],
+        'match_status': pd.Categorical(['Crime', 'Dispatch', 'Crime'], categories=['Dispatch', 'Crime', 'Match']),
+    })
+    result = fuzzy_match(joined)
+    assert result['match_status'].tolist() == [FUZZY_STATUS, 'Crime']
+    assert result.loc[0, 'Latitude_dispatch'] == 39.1001
+    assert 0 < result.loc[0, 'match_confidence'] < 1
@@ -0,0 +1,94 @@
+"""
+data_service/geo_cache.py parses a TopoJSON file once per content
+"""
+import os
+import shutil
+import threading
+
+import pytest
+
+from data_service import geo_cache
+from data_service.registry import READERS, local_path
+
+
+@pytest.fixture
+def topo_file(tmp_path, monkeypatch):
+    path = tmp_path / 'tracts.json'
+    shutil.copy(local_path('scattermap_topo_low'), path)
+    monkeypatch.setattr(geo_cache, 'resolve', lambda name: (str(path), 'topojson'))
+    parses = []
+    read_topojson = READERS['topojson']
+
+    def counting_reader(source, schema):
+        parses.append(source)
+        return read_topojson(source, schema)
+
+    monkeypatch.setitem(geo_cache.READERS, 'topojson', counting_reader)
+    geo_cache.clear_geometry()
+    yield path, parses
+    geo_cache._name_locks.clear()
+    geo_cache.clear_geometry()
+
+
+def test_parsed_once(topo_file):
+    path, parses = topo_file
+    layer = geo_cache.load_geometry('test_tracts')
+    assert geo_cache.load_geometry('test_tracts') is layer
+    assert len(parses) == 1
+    assert 'geometry' not in layer.attributes.columns
+    assert len(layer.geometry) == len(layer)
+
+
+def test_touched_file_is_not_parsed_again(topo_file):
+    path, parses = topo_file
+    layer = geo_cache.load_geometry('test_tracts')
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert geo_cache.load_geometry('test_tracts') is layer
+    assert len(parses) == 1
+
+
+def test_changed_file_is_parsed_again(topo_file):
+    path, parses = topo_file
+    layer = geo_cache.load_geometry('test_tracts')
+    # Same features, different bytes
+    path.write_bytes(path.read_bytes() + b'\n')
+    changed = geo_cache.load_geometry('test_tracts')
+    assert changed is not layer
+    assert changed.content_hash != layer.content_hash
+    assert len(parses) == 2
+
+
+def test_subset_excludes_groups(topo_file):
+    layer = geo_cache.load_geometry('test_tracts')
+    group = next(iter(layer.index.masks))
+    subset = layer.subset([group])
+    assert len(subset) == len(layer) - layer.index.masks[group].sum()
+    assert layer.subset([group]) is subset
+    assert list(layer.columns(['id'], exclude=[group]).columns) == [geo_cache.KEY, 'id']
+
+
+def test_slow_parse_does_not_block_other_names(topo_file, monkeypatch):
+    path, parses = topo_file
+    started, release = threading.Event(), threading.Event()
+    read_topojson = geo_cache.READERS['topojson']
+
+    def blocking_reader(source, schema):
+        started.set()
+        release.wait(10)
+        return read_topojson(source, schema)
+
+    monkeypatch.setitem(geo_cache.READERS, 'topojson', blocking_reader)
+    loader = threading.Thread(target=geo_cache.load_geometry, args=('slow_tracts',))
+    loader.start()
+    try:
+        assert started.wait(10)
+        # Neither needs the lock of the name being parsed
+        assert geo_cache.content_hash('other_tracts')
+        monkeypatch.setitem(geo_cache.READERS, 'topojson', read_topojson)
+        assert len(geo_cache.load_geometry('other_tracts')) > 0
+        assert loader.is_alive()
+    finally:
+        release.set()
+        loader.join(10)
+    assert geo_cache.load_geometry('slow_tracts').content_hash == geo_cache.content_hash('other_tracts')
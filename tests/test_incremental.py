@@ -0,0 +1,117 @@
+"""
+pipeline/incremental.py refreshes only what changed and keeps the totals exact
+"""
+import os
+import shutil
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+from data_service.geo_cache import GeometryLayer
+from pipeline import incremental
+from pipeline.incremental import changed_months, read_tract_totals, rebuild_totals, refresh
+
+MONTHS = ['2024-01', '2024-02', '2024-03']
+
+
+@pytest.fixture(scope='module')
+def layer():
+    # Two side by side unit squares
+    frame = gpd.GeoDataFrame({'tract': ['west', 'east']}, geometry=[shapely.box(0, 0, 1, 1), shapely.box(1, 0, 2, 1)])
+    return GeometryLayer('test_tracts', 'test', frame)
+
+
+def incidents(seed, months=MONTHS, n=200):
+    rng = np.random.default_rng(seed)
+    starts = pd.to_datetime(rng.choice(months, n)) + pd.to_timedelta(rng.integers(0, 27, n), unit='D')
+    return pd.DataFrame({
+        'Start_Time': starts,
+        'Longitude': rng.uniform(-0.2, 2.2, n),
+        'Latitude': rng.uniform(0.1, 0.9, n),
+        'Agency': rng.choice(['MCPD', 'RPD'], n),
+        'Crime Name1': rng.choice(['Crime Against Person', 'Crime Against Property'], n),
+        'Crime Name2': rng.choice(['Robbery', 'Shoplifting'], n),
+        'match_status': rng.choice(['Match', 'Crime', 'Dispatch'], n),
+        'category': rng.choice(['theft from person', 'theft from property'], n),
+        'Police_district_Number': rng.choice(['1D', '2D'], n),
+        'month_year': starts.strftime('%Y-%m'),
+    })
+
+
+def write_source(df, path):
+    df.to_parquet(path, partition_cols=['month_year'], index=False)
+    return path
+
+
+def totals(store):
+    return read_tract_totals(store).sort_values(['tract', 'category']).reset_index(drop=True)
+
+
+def test_unchanged_copy_is_not_recomputed(tmp_path, layer):
+    source = write_source(incidents(0), tmp_path / 'source')
+    store = tmp_path / 'store'
+    assert refresh(source, store, layer=layer)['changed'] == MONTHS
+    assert refresh(source, store, layer=layer)['changed'] == []
+
+    # Same contents under new file names and mtimes
+    copy = tmp_path / 'copy'
+    shutil.copytree(source, copy)
+    for path in copy.rglob('*.parquet'):
+        path.rename(path.with_name('renamed-' + path.name))
+    assert changed_months(copy, store) == ([], [])
+
+
+def test_only_restamped_files_are_hashed(tmp_path, layer, monkeypatch):
+    source = write_source(incidents(4), tmp_path / 'source')
+    store = tmp_path / 'store'
+    hashed = []
+    file_digest = incremental._file_digest
+    monkeypatch.setattr(incremental, '_file_digest', lambda path: hashed.append(path) or file_digest(path))
+
+    refresh(source, store, layer=layer)
+    assert len(hashed) == len(MONTHS)
+    hashed.clear()
+    assert refresh(source, store, layer=layer)['changed'] == []
+    assert hashed == []
+
+    # Touched, same contents: hashed once, then remembered
+    path = next(source.rglob('*.parquet'))
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert refresh(source, store, layer=layer)['changed'] == []
+    assert hashed == [path.resolve()]
+    hashed.clear()
+    assert changed_months(source, store) == ([], [])
+    assert hashed == []
+
+
+def test_changed_and_removed_months(tmp_path, layer):
+    df = incidents(1)
+    source = write_source(df, tmp_path / 'source')
+    store = tmp_path / 'store'
+    refresh(source, store, layer=layer)
+
+    # February gets new incidents, March goes away
+    shutil.rmtree(source)
+    updated = pd.concat([df[df['month_year'] != '2024-03'], incidents(2, months=['2024-02'], n=50)])
+    write_source(updated, source)
+    assert refresh(source, store, layer=layer) == {'changed': ['2024-02'], 'removed': ['2024-03']}
+
+    fresh = tmp_path / 'fresh'
+    refresh(source, fresh, layer=layer)
+    pd.testing.assert_frame_equal(totals(store), totals(fresh))
+    pd.testing.assert_frame_equal(
+        rebuild_totals(store).sort_values(['tract', 'category']).reset_index(drop=True), totals(fresh)
+    )
+    # Points outside both squares are not counted
+    inside = updated['Longitude'].between(0, 2)
+    assert totals(store)['count'].sum() == inside.sum()
+
+
+def test_raw_ingest_output_is_rejected(tmp_path, layer):
+    source = write_source(incidents(3).drop(columns=['category', 'match_status']), tmp_path / 'source')
+    with pytest.raises(KeyError):
+        refresh(source, tmp_path / 'store', layer=layer)
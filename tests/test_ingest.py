@@ -0,0 +1,63 @@
+"""
+pipeline/ingest.py cleaning and partitioned output
+"""
+import warnings
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from pipeline.ingest import clean_chunk, ingest_export, read_partitions
+
+COLUMNS = ['Incident ID', 'Offence Code', 'CR Number', 'Dispatch Date / Time', 'Start_Date_Time', 'End_Date_Time',
+           'Victims', 'Crime Name1', 'Crime Name2', 'Crime Name3', 'Agency', 'Place', 'PRA', 'Latitude', 'Longitude',
+           'Police District Number', 'City']
+
+
+def crime_row(i, start, crime_name3='Theft', end='07/02/2019 01:00:00 PM', latitude=39.0):
+    return [i, '1', i, start, start, end, 1, 'Crime Against Property', 'Shoplifting', crime_name3, 'MCPD',
+            'Street', 1.0, latitude, -77.0, '1D', 'Rockville']
+
+
+@pytest.fixture
+def export(tmp_path):
+    rows = [
+        # First chunk: Crime Name3 is empty in every row
+        crime_row(1, '07/01/2019 01:00:00 PM', crime_name3=None),
+        crime_row(2, '07/15/2019 01:00:00 PM', crime_name3=None),
+        crime_row(3, '05/31/2018 11:59:00 PM', crime_name3=None),
+        # Second chunk
+        crime_row(4, '08/01/2019 01:00:00 PM'),
+        crime_row(5, '08/02/2019 01:00:00 PM', end=None),
+        crime_row(6, '07/01/2024 01:00:00 PM'),
+        crime_row(7, '08/03/2019 01:00:00 PM', latitude=None),
+    ]
+    path = tmp_path / 'crime.csv'
+    pd.DataFrame(rows, columns=COLUMNS).to_csv(path, index=False)
+    return path
+
+
+def test_clean_chunk(export):
+    raw = pd.read_csv(export)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', pd.errors.SettingWithCopyWarning)
+        clean = clean_chunk(raw, 'crime')
+    # Outside the 2018-06 to 2024-06 cutoff, no End_Date_Time, no coordinates
+    assert clean['Incident ID'].tolist() == [1, 2, 4]
+    assert clean['month_year'].tolist() == ['2019-07', '2019-07', '2019-08']
+    assert {'Start_Time', 'End_Time', 'Dispatch_Time'} <= set(clean.columns)
+    assert pd.api.types.is_datetime64_any_dtype(clean['Start_Time'])
+
+
+def test_partitions_share_one_schema(export, tmp_path):
+    out = tmp_path / 'out'
+    stats = ingest_export(export, 'crime', out, chunksize=3)
+    assert stats == {'chunks': 3, 'rows_written': 3}
+    assert 'City' not in read_partitions(out).columns
+
+    schemas = {pq.read_schema(path).remove_metadata() for path in out.rglob('*.parquet')}
+    assert len(schemas) == 1
+    df = read_partitions(out)
+    assert sorted(df['month_year'].unique()) == ['2019-07', '2019-08']
+    assert df.loc[df['Incident ID'] == 4, 'Crime Name3'].tolist() == ['Theft']
+    assert read_partitions(out, months=['2019-08'])['Incident ID'].tolist() == [4]
@@ -0,0 +1,64 @@
+"""
+pipeline/join.py against the pd.merge outer joins of PythonCapstone.ipynb
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.join import join_incidents, normalize_keys
+
+
+@pytest.fixture
+def frames():
+    rng = np.random.default_rng(0)
+    # Small key ranges so there are duplicates and many-to-many matches on both sides
+    crime = pd.DataFrame({
+        'CR Number': rng.integers(1, 60, 200),
+        'Incident ID': rng.integers(1, 60, 200),
+        'Victims': rng.integers(1, 4, 200),
+    })
+    dispatch = pd.DataFrame({
+        'Crime Reports': rng.integers(30, 90, 150).astype(str),
+        'Incident_ID': [f'P{i}' for i in rng.integers(1, 60, 150)],
+        'Priority': rng.integers(0, 5, 150),
+    })
+    return crime, dispatch
+
+
+def merge_counts(crime, dispatch, key):
+    merged = pd.merge(crime, dispatch, on=key, how='outer', indicator=True)
+    status = merged['_merge'].map({'both': 'Match', 'left_only': 'Crime', 'right_only': 'Dispatch'})
+    counts = status.value_counts()
+    return counts[counts > 0].to_dict()
+
+
+@pytest.mark.parametrize('key', ['ID', 'Incident_ID'])
+def test_counts_match_merge(frames, key):
+    crime, dispatch = normalize_keys(*frames)
+    other = 'Incident_ID' if key == 'ID' else 'ID'
+    expected = merge_counts(crime.drop(columns=other), dispatch.drop(columns=other), key)
+    joined = join_incidents(crime, dispatch, strategies=[key], normalized=True)[key]
+    counts = joined['match_status'].value_counts()
+    assert counts[counts > 0].to_dict() == expected
+
+
+def test_missing_keys_never_match():
+    crime = pd.DataFrame({'CR Number': [None, 5], 'Incident ID': [1, 2]})
+    dispatch = pd.DataFrame({'Crime Reports': [None, '6'], 'Incident_ID': ['P3', 'P4']})
+    joined = join_incidents(crime, dispatch, strategies=['ID'])['ID']
+    assert (joined['match_status'] != 'Match').all()
+    assert len(joined) == 4
+
+
+def test_cascade_matches_leftovers_on_incident_id(frames):
+    crime, dispatch = normalize_keys(*frames)
+    cascade = join_incidents(crime, dispatch, strategies=['cascade'], normalized=True)['cascade']
+    by_id = merge_counts(crime.drop(columns='Incident_ID'), dispatch.drop(columns='Incident_ID'), 'ID')
+    assert (cascade['match_key'] == 'ID').sum() == by_id['Match']
+
+    # Incident_ID only pairs the rows the ID join left unmatched
+    crime_left = crime[~crime['ID'].isin(dispatch['ID'])].drop(columns='ID')
+    dispatch_left = dispatch[~dispatch['ID'].isin(crime['ID'])].drop(columns='ID')
+    by_incident = merge_counts(crime_left, dispatch_left, 'Incident_ID')
+    assert (cascade['match_key'] == 'Incident_ID').sum() == by_incident['Match']
+    assert cascade['match_status'].value_counts()['Match'] == by_id['Match'] + by_incident['Match']
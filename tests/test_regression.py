@@ -0,0 +1,78 @@
+"""
+data_service/regression.py against scikit-learn
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import r2_score
+
+from data_service.regression import batched_ols, bootstrap_regressions, compute_regressions, filter_label
+from data_service.tract_index import TractIndex
+
+
+@pytest.fixture
+def counts():
+    rng = np.random.default_rng(3)
+    X = rng.poisson(40, size=(3, 60)).astype(float)
+    Y = 0.6 * X + rng.normal(0, 5, size=X.shape) + 10
+    W = (rng.random((4, 60)) > 0.3).astype(float)
+    W[0] = 1
+    return X, Y, W
+
+
+def sklearn_fit(x, y):
+    model = LinearRegression().fit(x.reshape(-1, 1), y)
+    return model.coef_[0], model.intercept_, r2_score(y, model.predict(x.reshape(-1, 1)))
+
+
+def test_matches_linear_regression(counts):
+    X, Y, W = counts
+    slope, intercept, r2, n = batched_ols(X, Y, W)
+    for f, keep in enumerate(W.astype(bool)):
+        for t in range(len(X)):
+            expected = sklearn_fit(X[t, keep], Y[t, keep])
+            assert (slope[f, t], intercept[f, t], r2[f, t]) == pytest.approx(expected, rel=1e-9, abs=1e-9)
+            assert n[f, t] == keep.sum()
+
+
+def test_constant_columns_follow_sklearn():
+    x = np.array([[3.0, 3.0, 3.0, 3.0]])
+    y = np.array([[1.0, 2.0, 4.0, 5.0]])
+    slope, intercept, r2, _ = batched_ols(x, y, np.ones((1, 4)))
+    assert (slope[0, 0], intercept[0, 0], r2[0, 0]) == pytest.approx(sklearn_fit(x[0], y[0]))
+
+    slope, intercept, r2, _ = batched_ols(y, np.full((1, 4), 7.0), np.ones((1, 4)))
+    assert (slope[0, 0], intercept[0, 0], r2[0, 0]) == pytest.approx((0.0, 7.0, 1.0))
+
+
+def test_table_uses_group_masks(counts):
+    X, Y, _ = counts
+    tracts = [f't{i}' for i in range(X.shape[1])]
+    attributes = pd.DataFrame({'tract': tracts})
+    for t, crime in enumerate(['theft', 'drug', 'parts']):
+        attributes[f'dispatch_{crime}'] = X[t]
+        attributes[f'crime_{crime}'] = Y[t]
+    index = TractIndex(tracts, {'north': {'tracts': tracts[:10]}, 'east': {'tracts': tracts[5:20]}})
+
+    table = compute_regressions(attributes, ['theft', 'drug', 'parts'], index)
+    keep = ~np.isin(tracts, tracts[:20])
+    fit = table.get('drug', excluded=['north', 'east'])
+    assert (fit['slope'], fit['intercept'], fit['r2']) == pytest.approx(sklearn_fit(X[1, keep], Y[1, keep]))
+    assert fit['n'] == keep.sum()
+    assert len(table.frame) == 4 * 3
+    assert filter_label(['north', 'east']) == 'east,north'
+
+
+def test_bootstrap_brackets_the_fit(counts):
+    X, Y, _ = counts
+    attributes = pd.DataFrame({'dispatch_theft': X[0], 'crime_theft': Y[0]})
+    result = bootstrap_regressions(attributes, ['theft'], np.ones(len(attributes), dtype=bool), n_resamples=500)
+    slope = sklearn_fit(X[0], Y[0])[0]
+    low, high = result['theft']['slope_ci']
+    assert low < slope < high
+    band = result['theft']['band']
+    assert (band['low'] <= band['high']).all()
+    # Same seed, same intervals
+    again = bootstrap_regressions(attributes, ['theft'], np.ones(len(attributes), dtype=bool), n_resamples=500)
+    assert again['theft']['slope_ci'] == result['theft']['slope_ci']
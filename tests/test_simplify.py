@@ -0,0 +1,49 @@
+"""
+pipeline/simplify.py writes only valid polygons at every level
+"""
+import json
+
+import pytest
+
+from data_service.geo_cache import GEOMETRY_LEVELS, level_dataset
+from data_service.registry import local_path
+from pipeline import simplify
+
+
+@pytest.fixture(scope='module')
+def topology():
+    with open(local_path('scattermap_topo'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def geometries(topology):
+    return [geometry for obj in topology['objects'].values() for geometry in obj.get('geometries', [obj])]
+
+
+def invalid(topology):
+    return simplify.invalid_geometries(geometries(topology), simplify.decode_arcs(topology))
+
+
+@pytest.mark.parametrize('level', list(GEOMETRY_LEVELS))
+def test_levels_are_valid(topology, level):
+    settings = GEOMETRY_LEVELS[level]
+    simplified = simplify.simplify_topology(topology, settings['tolerance'], settings['quantization'], ['tract'])
+    assert invalid(simplified) == []
+    assert len(geometries(simplified)) == len(geometries(topology))
+    # The grid is only ever made finer than asked for
+    bbox = simplified['bbox']
+    assert simplified['transform']['scale'][0] <= (bbox[2] - bbox[0]) / (settings['quantization'] - 1)
+
+
+@pytest.mark.parametrize('level', list(GEOMETRY_LEVELS))
+def test_static_levels_are_valid(level):
+    with open(local_path(level_dataset('scattermap_topo', level)), encoding='utf-8') as f:
+        assert invalid(json.load(f)) == []
+
+
+def test_unquantized_fallback(topology, monkeypatch):
+    monkeypatch.setattr(simplify, 'MAX_REFINEMENTS', 1)
+    # A grid far too coarse for the tracts
+    simplified = simplify.simplify_topology(topology, 0.0007, 50)
+    assert 'transform' not in simplified
+    assert invalid(simplified) == []
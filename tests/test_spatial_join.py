@@ -0,0 +1,61 @@
+"""
+pipeline/spatial_join.py against geopandas.sjoin
+"""
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_service.registry import read_dataset
+from pipeline.spatial_join import NO_TRACT, assign_tracts, tract_aggregates
+
+
+@pytest.fixture(scope='module')
+def tracts():
+    return read_dataset('scattermap_topo_low').reset_index(drop=True)
+
+
+@pytest.fixture(scope='module')
+def points(tracts):
+    rng = np.random.default_rng(4)
+    min_x, min_y, max_x, max_y = tracts.total_bounds
+    # Past the bounding box too, so some points fall outside every tract
+    lon = rng.uniform(min_x - 0.05, max_x + 0.05, 3000)
+    lat = rng.uniform(min_y - 0.05, max_y + 0.05, 3000)
+    # A few points exactly on tract vertices, which touch more than one tract
+    vertices = tracts.geometry.get_coordinates().sample(50, random_state=0).to_numpy()
+    lon, lat = np.r_[lon, vertices[:, 0], np.nan], np.r_[lat, vertices[:, 1], 39.0]
+    return lon, lat
+
+
+def sjoin_codes(tracts, lon, lat):
+    points = gpd.GeoDataFrame(geometry=gpd.points_from_xy(lon, lat), crs=tracts.crs)
+    joined = gpd.sjoin(points, tracts[['geometry']], how='left', predicate='intersects')
+    # First tract in layer order for points on a border, like assign_tracts
+    first = joined['index_right'].groupby(level=0).min()
+    return first.reindex(range(len(lon))).fillna(NO_TRACT).astype(int).to_numpy()
+
+
+def test_matches_sjoin(tracts, points):
+    lon, lat = points
+    codes = assign_tracts(lon, lat, tracts.geometry.to_numpy(), processes=1)
+    expected = sjoin_codes(tracts, lon, lat)
+    assert (codes != NO_TRACT).sum() > 1000
+    assert (codes == NO_TRACT).sum() > 100
+    np.testing.assert_array_equal(codes, expected)
+
+
+def test_chunks_and_processes_agree(tracts, points):
+    lon, lat = points
+    single = assign_tracts(lon, lat, tracts.geometry.to_numpy(), processes=1)
+    chunked = assign_tracts(lon, lat, tracts.geometry.to_numpy(), chunksize=700, processes=2)
+    np.testing.assert_array_equal(chunked, single)
+
+
+def test_aggregates_count_each_incident_once():
+    codes = np.array([0, 1, 1, NO_TRACT, 2, 0])
+    labels = ['theft', 'drug', 'theft', 'theft', None, 'drug']
+    counts = tract_aggregates(codes, ['a', 'b', 'c'], labels, prefix='crime_')
+    expected = pd.DataFrame({'crime_drug': [1, 1, 0], 'crime_theft': [1, 1, 0]}, index=pd.Index(['a', 'b', 'c'], name='tract'))
+    pd.testing.assert_frame_equal(counts, expected)
+    assert tract_aggregates(codes, ['a', 'b', 'c'])['count'].tolist() == [2, 2, 1]